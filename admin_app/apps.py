@@ -5,6 +5,11 @@ class AdminAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'admin_app'
 
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .db_pool import install
+        install()
+
 
 
 
@@ -0,0 +1,114 @@
+"""
+Stateless JWT authentication.
+
+The login endpoint issues an access/refresh pair whose claims carry the
+user's name, email and AdminUser role, so authenticated requests are
+verified in-process from the signature and claims without touching the
+session table or the User table.
+
+Logging out puts the token ids on a denylist kept in the Django cache
+until the tokens would have expired anyway. With the default local-memory
+cache the denylist is per process; configure a shared cache to make
+logouts apply to every worker.
+"""
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+from .models import AdminUser
+
+DENYLIST_PREFIX = 'jwt-denied:'
+# Matches none of the roles the permissions in permissions.py allow
+NO_ROLE = ''
+ROLE_LABELS = dict(AdminUser.ROLE_CHOICES)
+
+
+def user_role(user, admin_user=None):
+    """The AdminUser role; without one only superusers are admins"""
+    if admin_user is not None:
+        return admin_user.role
+    return 'admin' if user.is_superuser else NO_ROLE
+
+
+def role_display(role):
+    return ROLE_LABELS.get(role, '')
+
+
+def issue_tokens(user, admin_user=None):
+    """Return a refresh token for ``user`` carrying the profile claims"""
+    refresh = RefreshToken.for_user(user)
+    refresh['username'] = user.username
+    refresh['email'] = user.email
+    refresh['first_name'] = user.first_name
+    refresh['last_name'] = user.last_name
+    refresh['is_staff'] = user.is_staff
+    refresh['is_superuser'] = user.is_superuser
+    refresh['role'] = user_role(user, admin_user)
+    refresh['phone'] = admin_user.phone if admin_user else ''
+    return refresh
+
+
+def deny_token(token):
+    """Reject ``token`` until it expires"""
+    remaining = datetime_from_epoch(token['exp']) - aware_utcnow()
+    timeout = int(remaining.total_seconds()) + 1
+    if timeout > 0:
+        cache.set(DENYLIST_PREFIX + token['jti'], True, timeout=timeout)
+
+
+def is_denied(token):
+    return cache.get(DENYLIST_PREFIX + token['jti'], False)
+
+
+class AdminTokenUser(TokenUser):
+    """Request user built from the token claims"""
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @cached_property
+    def first_name(self):
+        return self.token.get('first_name', '')
+
+    @cached_property
+    def last_name(self):
+        return self.token.get('last_name', '')
+
+    @cached_property
+    def role(self):
+        return self.token.get('role', NO_ROLE)
+
+    @cached_property
+    def role_display(self):
+        return role_display(self.role)
+
+    @cached_property
+    def phone(self):
+        return self.token.get('phone', '')
+
+    def profile(self):
+        return {
+            'id': int(self.id),
+            'username': self.username,
+            'email': self.email,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'role': self.role,
+            'role_display': self.role_display,
+            'phone': self.phone,
+        }
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """Bearer token authentication without database lookups"""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_denied(token):
+            raise InvalidToken('Token has been revoked')
+        return token
@@ -0,0 +1,108 @@
+"""
+Cart ingestion for table orders placed from the QR menu.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from rest_framework import status
+
+from .models import MenuItem, OrderMenu, Table, orderMenuItem
+
+
+class CartError(Exception):
+    """Raised when a cart cannot be turned into an order"""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_quantity(value):
+    """``value`` as an int of at least 1, or ValueError"""
+    number = int(value)
+    if number < 1:
+        raise ValueError(value)
+    return number
+
+
+def parse_amount(value):
+    """
+    A price or total as whole currency units, or ValueError. Accepts the
+    decimal strings the menu serializes prices as (``"25000.00"``); the
+    fraction is dropped, as the integer columns did with the floats the
+    cart view used to store.
+    """
+    try:
+        number = Decimal(str(value)) if isinstance(value, (int, float, str)) else None
+    except InvalidOperation:
+        number = None
+    if isinstance(value, bool) or number is None or not number.is_finite() or number < 0:
+        raise ValueError(value)
+    return int(number)
+
+
+def ingest_cart(data):
+    """
+    Create an OrderMenu and its orderMenuItem lines from a cart payload.
+
+    All menu items are resolved with a single query and the lines are
+    written with one bulk insert inside a transaction, so a bad line never
+    leaves a half-written order behind.
+    """
+    if not isinstance(data, dict):
+        raise CartError('The cart must be a JSON object')
+    try:
+        table_number = data["table_id"]
+        total_amount = data["total_amount"]
+        lines = data["items"]
+    except KeyError as exc:
+        raise CartError(f"Missing field: {exc.args[0]}")
+
+    try:
+        total_amount = parse_amount(total_amount)
+    except ValueError:
+        raise CartError('total_amount must be an amount of at least 0')
+
+    try:
+        table = Table.objects.get(number=table_number)
+    except Table.DoesNotExist:
+        raise CartError('Table not found', status.HTTP_404_NOT_FOUND)
+
+    try:
+        menu_item_ids = {int(line["menu_item_id"]) for line in lines}
+    except (KeyError, TypeError, ValueError):
+        raise CartError('Every item needs a valid menu_item_id')
+
+    try:
+        amounts = [
+            (parse_quantity(line["quantity"]), parse_amount(line["price"]))
+            for line in lines
+        ]
+    except (KeyError, TypeError, ValueError, OverflowError):
+        raise CartError('Every item needs a quantity and a price')
+
+    menu_items = MenuItem.objects.in_bulk(menu_item_ids)
+    missing = menu_item_ids - menu_items.keys()
+    if missing:
+        raise CartError(f"Menu items not found: {sorted(missing)}")
+
+    with transaction.atomic():
+        order = OrderMenu.objects.create(
+            total_price=total_amount,
+            table=table,
+            status=data.get("status", "pending"),
+            payment_method=data.get("payment_method", "cash"),
+        )
+        order_lines = [
+            orderMenuItem(
+                ordermenu=order,
+                item=menu_items[int(line["menu_item_id"])],
+                quantity=quantity,
+                price=price,
+                special_request=line.get("special_requests"),
+            )
+            for line, (quantity, price) in zip(lines, amounts)
+        ]
+        orderMenuItem.objects.bulk_create(order_lines)
+
+    return order
@@ -0,0 +1,128 @@
+"""
+Incrementally maintained dashboard counters.
+
+Each tracked model maps an instance to its contribution to the counters
+(e.g. a confirmed booking adds 1 to ``active_bookings``). Before a save or
+delete the stored row is re-read with ``SELECT ... FOR UPDATE`` and only
+the difference between its contribution and the new one is applied to the
+single DashboardCounters row with F() expressions. Tracked models save in a
+transaction (``CountedModel``) and Django deletes in one, so the lock is
+held until the counters are updated: two requests changing the same row
+one after the other apply one change each, never the same one twice.
+
+Writes that bypass model signals (``QuerySet.update``, raw SQL) are not
+seen; ``python manage.py rebuild_dashboard_counters`` recomputes the row.
+"""
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import (
+    Booking, Category, ContactMessage, DashboardCounters, MenuItem, Order
+)
+
+COUNTERS_PK = 1
+
+ACTIVE_BOOKING_STATUSES = ['new', 'confirmed']
+PENDING_ORDER_STATUSES = ['pending', 'confirmed']
+REVENUE_ORDER_STATUSES = ['delivered', 'ready']
+
+
+def _order_contribution(order):
+    return {
+        'pending_orders': int(order.status in PENDING_ORDER_STATUSES),
+        'total_revenue': Decimal(order.total or 0) if order.status in REVENUE_ORDER_STATUSES else Decimal(0),
+    }
+
+
+# model -> (fields the contribution depends on, contribution function)
+TRACKED_MODELS = {
+    Category: ((), lambda category: {'total_categories': 1}),
+    MenuItem: ((), lambda menu_item: {'total_menu_items': 1}),
+    Booking: (('status',), lambda booking: {
+        'active_bookings': int(booking.status in ACTIVE_BOOKING_STATUSES),
+    }),
+    ContactMessage: (('status',), lambda message: {
+        'new_messages': int(message.status == 'new'),
+    }),
+    Order: (('status', 'total'), _order_contribution),
+}
+
+
+def load_state(instance, using, deleting=False):
+    """Lock the stored row of ``instance`` and record its contribution"""
+    fields, contribution = TRACKED_MODELS[type(instance)]
+    if instance.pk is None:
+        instance._counter_state = {}
+    elif not fields and not deleting:
+        # Saving an existing row does not change a constant contribution.
+        instance._counter_state = contribution(instance)
+    else:
+        stored = (
+            type(instance)._base_manager.using(using).select_for_update()
+            .filter(pk=instance.pk).only('pk', *fields).first()
+        )
+        instance._counter_state = contribution(stored) if stored is not None else {}
+
+
+def after_save(instance, created):
+    _, contribution = TRACKED_MODELS[type(instance)]
+    old = {} if created else (getattr(instance, '_counter_state', None) or {})
+    new = contribution(instance)
+    apply_delta({key: new.get(key, 0) - old.get(key, 0) for key in new.keys() | old.keys()})
+    instance._counter_state = new
+
+
+def after_delete(instance):
+    state = getattr(instance, '_counter_state', None) or {}
+    apply_delta({key: -value for key, value in state.items()})
+    instance._counter_state = {}
+
+
+def apply_delta(delta):
+    """Atomically add ``delta`` to the counters row"""
+    updates = {key: F(key) + value for key, value in delta.items() if value}
+    if updates:
+        DashboardCounters.objects.filter(pk=COUNTERS_PK).update(
+            updated_at=timezone.now(), **updates
+        )
+
+
+def compute_counters():
+    """Count everything from scratch (the queries the dashboard used to run)"""
+    return {
+        'total_categories': Category.objects.count(),
+        'total_menu_items': MenuItem.objects.count(),
+        'active_bookings': Booking.objects.filter(status__in=ACTIVE_BOOKING_STATUSES).count(),
+        'pending_orders': Order.objects.filter(status__in=PENDING_ORDER_STATUSES).count(),
+        'new_messages': ContactMessage.objects.filter(status='new').count(),
+        'total_revenue': Order.objects.filter(
+            status__in=REVENUE_ORDER_STATUSES
+        ).aggregate(total=Sum('total'))['total'] or 0,
+    }
+
+
+def rebuild_counters():
+    """
+    Recompute the counters row. The row is locked first, so writers that
+    commit meanwhile wait and then apply their delta on top of the rebuilt
+    values.
+    """
+    with transaction.atomic():
+        counters, _ = DashboardCounters.objects.select_for_update().get_or_create(pk=COUNTERS_PK)
+        for key, value in compute_counters().items():
+            setattr(counters, key, value)
+        counters.save()
+    return counters
+
+
+async def aget_counters():
+    """Return the counters row, building it on first use"""
+    counters = await DashboardCounters.objects.filter(pk=COUNTERS_PK).afirst()
+    if counters is None:
+        # Transactions are not available to async code.
+        counters = await sync_to_async(rebuild_counters)()
+    return counters
@@ -0,0 +1,136 @@
+"""
+Database connection reuse and pool metrics.
+
+``settings.DB_POOL`` picks how connections are reused (see settings.py):
+
+- ``persistent``: Django keeps one connection per worker thread open for
+  ``DB_CONN_MAX_AGE`` seconds and checks it is alive before reusing it
+  after an error. A gunicorn sync worker holds one connection, a gthread
+  worker one per thread.
+- ``native``: psycopg 3's pool, shared by all threads of a process and
+  capped at ``DB_POOL_MAX_SIZE``. Requests return their connection to the
+  pool when they finish and wait up to ``DB_POOL_TIMEOUT`` seconds for one
+  when the pool is exhausted. The pool is created on first use, so it is
+  never shared across a gunicorn fork.
+- ``off``: a new connection per request.
+
+In every mode a request that needs a connection goes through
+``DatabaseWrapper.connect()``: opening a socket, or checking one out of the
+native pool. ``install()`` times those calls per alias, which gives the
+checkout count and wait time for this process; ``pool_stats()`` adds the
+native pool's own size, idle and queue counters so the pool can be sized.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+
+from .perf import Histogram
+
+# Upper bounds of the wait-time buckets, in milliseconds.
+WAIT_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+class CheckoutStats:
+    """Connection checkouts per database alias, for this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.aliases = {}
+        self.requests = 0
+
+    def observe(self, alias, wait_ms, failed):
+        with self.lock:
+            stats = self.aliases.get(alias)
+            if stats is None:
+                stats = self.aliases[alias] = {'errors': 0, 'wait_ms': Histogram(WAIT_BUCKETS)}
+            stats['wait_ms'].observe(wait_ms)
+            if failed:
+                stats['errors'] += 1
+
+    def count_request(self, **kwargs):
+        with self.lock:
+            self.requests += 1
+
+    def snapshot(self):
+        with self.lock:
+            return self.requests, {
+                alias: {
+                    'checkouts': stats['wait_ms'].count,
+                    'errors': stats['errors'],
+                    'wait_ms': stats['wait_ms'].as_dict(),
+                }
+                for alias, stats in self.aliases.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.aliases.clear()
+            self.requests = 0
+
+
+checkouts = CheckoutStats()
+_installed = False
+
+
+def install():
+    """Time every ``DatabaseWrapper.connect()`` of this process"""
+    global _installed
+    if _installed:
+        return
+    connect = BaseDatabaseWrapper.connect
+
+    def timed_connect(self):
+        start = time.perf_counter()
+        failed = True
+        try:
+            connect(self)
+            failed = False
+        finally:
+            checkouts.observe(self.alias, (time.perf_counter() - start) * 1000, failed)
+
+    BaseDatabaseWrapper.connect = timed_connect
+    request_started.connect(checkouts.count_request, dispatch_uid='db_pool_requests')
+    _installed = True
+
+
+def native_pool_stats(connection):
+    """Counters of the psycopg pool behind ``connection``, or None"""
+    if not connection.settings_dict.get('OPTIONS', {}).get('pool'):
+        return None
+    pool = connection.pool
+    stats = pool.get_stats()
+    in_use = stats['pool_size'] - stats['pool_available']
+    return {
+        'min_size': pool.min_size,
+        'max_size': pool.max_size,
+        'size': stats['pool_size'],
+        'idle': stats['pool_available'],
+        'in_use': in_use,
+        'waiting': stats.get('requests_waiting', 0),
+        'saturation': round(in_use / pool.max_size, 2),
+        'timeouts': stats.get('requests_errors', 0),
+    }
+
+
+def pool_stats():
+    """Checkout metrics per alias for this worker process"""
+    requests, aliases = checkouts.snapshot()
+    databases = {}
+    for connection in connections.all():
+        stats = aliases.get(connection.alias, {'checkouts': 0, 'errors': 0, 'wait_ms': None})
+        stats['conn_max_age'] = connection.settings_dict['CONN_MAX_AGE']
+        stats['health_checks'] = connection.settings_dict['CONN_HEALTH_CHECKS']
+        stats['pool'] = native_pool_stats(connection)
+        databases[connection.alias] = stats
+    return {
+        'mode': getattr(settings, 'DB_POOL', 'off'),
+        'pid': os.getpid(),
+        'threads': threading.active_count(),
+        'requests': requests,
+        'databases': databases,
+    }
@@ -0,0 +1,150 @@
+"""
+In-process event broker for Server-Sent Event streams.
+
+Views publish events from synchronous code (usually from
+``transaction.on_commit``) and async stream views fan them out to every
+connected client. Each broker keeps a short history so a client that
+reconnects with ``Last-Event-ID`` receives what it missed instead of
+reloading everything.
+
+The broker lives in the worker process, so it is meant for single-process
+ASGI deployments (one uvicorn/daphne worker per node).
+"""
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+
+from rest_framework.renderers import JSONRenderer
+
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+def encode_event(name, data, id=None):
+    """Encode one event in SSE wire format"""
+    head = f"id: {id}\nevent: {name}\ndata: " if id else f"event: {name}\ndata: "
+    return head.encode() + JSONRenderer().render(data) + b"\n\n"
+
+
+class Event:
+    """A published event, pre-encoded in SSE wire format"""
+    __slots__ = ('id', 'seq', 'name', 'payload')
+
+    def __init__(self, id, seq, name, data):
+        self.id = id
+        self.seq = seq
+        self.name = name
+        self.payload = encode_event(name, data, id)
+
+
+class EventBroker:
+    """Fan out events to async subscribers with a bounded replay history"""
+
+    def __init__(self, name, history=500):
+        self.name = name
+        # Event ids are "<epoch>-<seq>"; a different epoch means the
+        # process restarted and the client's cursor is meaningless.
+        self.epoch = str(time.time_ns())
+        self._seq = itertools.count(1)
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, name, data):
+        """Publish an event; safe to call from any thread"""
+        with self._lock:
+            seq = next(self._seq)
+            event = Event(f"{self.epoch}-{seq}", seq, name, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # The subscriber's event loop has already shut down.
+                self._discard((loop, queue))
+        return event
+
+    def replay(self, last_event_id):
+        """
+        Return the events published after ``last_event_id``, or ``None`` when
+        the cursor is unknown or has fallen out of the history window.
+        """
+        epoch, _, seq = (last_event_id or '').partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        with self._lock:
+            history = list(self._history)
+        if history and history[0].seq > seq + 1:
+            return None
+        return [event for event in history if event.seq > seq]
+
+    async def stream(self, last_event_id=None, initial=None):
+        """
+        Async generator of SSE chunks. ``initial`` is an optional coroutine
+        function returning chunks to send first, e.g. a snapshot for clients
+        without a cursor. It runs after subscribing so no event is lost
+        between the snapshot and the live feed.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        subscriber = (loop, queue)
+        with self._lock:
+            self._subscribers.add(subscriber)
+
+        last_seq = 0
+        try:
+            yield b"retry: 3000\n\n"
+            if last_event_id:
+                missed = self.replay(last_event_id)
+                if missed is None:
+                    yield b"event: reset\ndata: {}\n\n"
+                else:
+                    for event in missed:
+                        last_seq = event.seq
+                        yield event.payload
+            if initial is not None:
+                for chunk in await initial():
+                    yield chunk
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if event is None:
+                    # Dropped for falling too far behind; let the client
+                    # reconnect with its cursor.
+                    return
+                if event.seq <= last_seq:
+                    # Already sent while replaying the history.
+                    continue
+                yield event.payload
+        finally:
+            self._discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _discard(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @staticmethod
+    def _deliver(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+
+order_events = EventBroker('orders')
+waiter_events = EventBroker('waiter-requests')
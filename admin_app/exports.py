@@ -0,0 +1,190 @@
+"""
+Streaming NDJSON and CSV exports.
+
+Rows are read oldest first with ``.iterator(chunk_size=...)``, which uses a
+server-side cursor on PostgreSQL, and written out a chunk at a time. The
+line items of a chunk are fetched with one query, so memory use depends on
+the chunk size rather than on the number of rows exported.
+
+NDJSON writes one object per order with its items nested. CSV writes one
+line per line item, repeating the order columns; orders without items get a
+single line with the item columns left empty.
+"""
+import csv
+import datetime
+from decimal import Decimal
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .fast_serializers import iso_datetime, render_json
+from .models import (
+    Booking, ContactMessage, Order, OrderItem, OrderMenu, orderMenuItem
+)
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class LineItems:
+    """Child rows exported with each parent row"""
+
+    def __init__(self, model, parent_field, columns):
+        self.model = model
+        self.parent_field = parent_field
+        self.columns = columns
+
+    def by_parent(self, parent_ids, using='default'):
+        rows = (
+            self.model.objects.using(using).filter(**{f"{self.parent_field}__in": parent_ids})
+            .order_by(self.parent_field, 'pk')
+            .values(self.parent_field, *(lookup for _, lookup in self.columns))
+        )
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row[self.parent_field], []).append(
+                {name: row[lookup] for name, lookup in self.columns}
+            )
+        return grouped
+
+
+class Export:
+    """Columns of one exportable model as (output name, lookup) pairs"""
+
+    def __init__(self, name, model, columns, items=None):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        self.items = items
+
+    def header(self):
+        header = [name for name, _ in self.columns]
+        if self.items is not None:
+            header += [f'item_{name}' for name, _ in self.items.columns]
+        return header
+
+    def records(self, queryset, chunk_size=CHUNK_SIZE):
+        """Yield one dict per row, line items attached under ``items``"""
+        rows = (
+            queryset.order_by('created_at', 'id')
+            .values(*(lookup for _, lookup in self.columns))
+            .iterator(chunk_size=chunk_size)
+        )
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            items = {}
+            if self.items is not None:
+                items = self.items.by_parent([row['id'] for row in chunk], queryset.db)
+            for row in chunk:
+                record = {name: row[lookup] for name, lookup in self.columns}
+                if self.items is not None:
+                    record['items'] = items.get(row['id'], [])
+                yield record
+
+
+def _model_columns(model):
+    return [(field.attname, field.attname) for field in model._meta.concrete_fields]
+
+
+EXPORTS = {
+    'orders': Export('orders', Order, _model_columns(Order), LineItems(
+        OrderItem, 'order_id',
+        [('menu_item', 'menu_item_id'), ('name', 'name'), ('price', 'price'), ('quantity', 'quantity')],
+    )),
+    'menu_orders': Export('menu_orders', OrderMenu, [
+        ('id', 'id'), ('table', 'table__number'), ('status', 'status'),
+        ('payment_method', 'payment_method'), ('total_price', 'total_price'),
+        ('created_at', 'created_at'),
+    ], LineItems(
+        orderMenuItem, 'ordermenu_id',
+        [('menu_item', 'item_id'), ('name', 'item__name'), ('price', 'price'),
+         ('quantity', 'quantity'), ('special_request', 'special_request')],
+    )),
+    'bookings': Export('bookings', Booking, _model_columns(Booking)),
+    'contacts': Export('contacts', ContactMessage, _model_columns(ContactMessage)),
+}
+
+
+def plain(value, tz):
+    """The text form of a column value, as the API renders it"""
+    if isinstance(value, datetime.datetime):
+        return iso_datetime(value, tz)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def ndjson_lines(records):
+    tz = timezone.get_current_timezone()
+    for record in records:
+        record = {key: plain(value, tz) for key, value in record.items()}
+        if 'items' in record:
+            record['items'] = [
+                {key: plain(value, tz) for key, value in item.items()}
+                for item in record['items']
+            ]
+        yield render_json(record) + b'\n'
+
+
+class _Echo:
+    """File-like object handing back whatever csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(export, records):
+    tz = timezone.get_current_timezone()
+    writer = csv.writer(_Echo())
+    yield writer.writerow(export.header())
+    for record in records:
+        row = [plain(record[name], tz) for name, _ in export.columns]
+        if export.items is None:
+            yield writer.writerow(row)
+            continue
+        empty = [None] * len(export.items.columns)
+        for item in record['items'] or [None]:
+            item_row = empty if item is None else [plain(item[name], tz) for name, _ in export.items.columns]
+            yield writer.writerow(row + item_row)
+
+
+async def _iterate_in_thread(iterator):
+    """Drive a sync iterator from an ASGI response one chunk at a time"""
+    iterator = iter(iterator)
+    done = object()
+    while True:
+        chunk = await sync_to_async(next, thread_sensitive=True)(iterator, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+def export_response(request, export, queryset, output='ndjson', chunk_size=CHUNK_SIZE):
+    """Stream ``queryset`` as NDJSON or CSV"""
+    # The body is read after the request has left the middleware, so pin
+    # the database the router picks now (the replica for exports).
+    records = export.records(queryset.using(queryset.db), chunk_size)
+    if output == 'csv':
+        lines = csv_lines(export, records)
+    else:
+        lines = ndjson_lines(records)
+
+    # Django buffers a sync iterator in full before serving it over ASGI.
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        lines = _iterate_in_thread(lines)
+
+    response = StreamingHttpResponse(lines, content_type=FORMATS[output])
+    filename = f"{export.name}-{timezone.localdate().isoformat()}.{output}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,338 @@
+"""
+Two-tier cache for the hot read endpoints.
+
+``TwoTierCache`` is a cache backend (the ``hot`` alias in settings) that
+keeps a bounded LRU of entries in each process in front of a shared cache
+(``OPTIONS['SHARED']``, normally ``default``: Redis in production, a
+directory of files or local memory in development and tests). Local hits
+cost a dict lookup; a local miss falls back to one shared lookup; only a
+miss in both runs the computation.
+
+``get_or_compute()``/``aget_or_compute()`` add stampede protection on top:
+
+- Entries remember how long they took to compute and are refreshed early
+  with a probability that grows as expiry approaches (XFetch: refresh when
+  ``now - delta * beta * log(rand) >= expiry``), so a hot key is usually
+  recomputed by one request before it expires rather than by all of them
+  after.
+- The recomputation is guarded by a lock in the shared cache. Requests that
+  do not get the lock keep serving the current entry, which the shared
+  cache holds for ``STALE_SECONDS`` past its expiry; with nothing to serve
+  they wait up to ``LOCK_SECONDS`` for the lock holder's result.
+
+Hits and misses are counted per key prefix (the part before the first
+``:``) for this process, see ``stats()``, and for all processes in
+``/metrics``.
+"""
+import asyncio
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+STAT_NAMES = ('local_hits', 'shared_hits', 'stale_hits', 'misses', 'early_refreshes', 'waits')
+# Counter name -> ``result`` label of cache_requests_total in /metrics
+METRIC_RESULTS = {
+    'local_hits': 'local_hit', 'shared_hits': 'shared_hit', 'stale_hits': 'stale_hit',
+    'misses': 'miss', 'early_refreshes': 'early_refresh', 'waits': 'wait',
+}
+LOCK_PREFIX = 'lock:'
+POLL_SECONDS = 0.05
+
+
+class Entry:
+    """A cached value with its logical expiry and the seconds it took to compute"""
+    __slots__ = ('value', 'expires', 'delta')
+
+    def __init__(self, value, expires, delta=0.0):
+        self.value = value
+        self.expires = expires
+        self.delta = delta
+
+    def __reduce__(self):
+        return (Entry, (self.value, self.expires, self.delta))
+
+    def fresh(self, now, beta=1.0):
+        """False once expired, or when XFetch picks this request to refresh early"""
+        return now - self.delta * beta * math.log(1.0 - random.random()) < self.expires
+
+
+class LocalTier:
+    """The LRU and counters of one TwoTierCache, shared by the threads of a process"""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.counters = {}
+        self.lock = threading.Lock()
+
+
+# Django creates a cache instance per thread, so like LocMemCache the
+# per-process state lives here, keyed by LOCATION.
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class TwoTierCache(BaseCache):
+    """Bounded per-process LRU in front of a shared cache alias"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', 'default')
+        self.max_local = options.get('MAX_LOCAL_ENTRIES', 1000)
+        self.stale_seconds = options.get('STALE_SECONDS', 60)
+        self.lock_seconds = options.get('LOCK_SECONDS', 10)
+        self.beta = options.get('BETA', 1.0)
+        with _tiers_lock:
+            tier = _tiers.setdefault(location, LocalTier())
+        self.local = tier.entries
+        self.counters = tier.counters
+        self.lock = tier.lock
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    # Local tier
+
+    def local_get(self, key):
+        with self.lock:
+            entry = self.local.get(key)
+            if entry is not None:
+                self.local.move_to_end(key)
+            return entry
+
+    def local_set(self, key, entry):
+        with self.lock:
+            self.local[key] = entry
+            self.local.move_to_end(key)
+            while len(self.local) > self.max_local:
+                self.local.popitem(last=False)
+
+    def local_delete(self, key):
+        with self.lock:
+            self.local.pop(key, None)
+
+    def count(self, prefix, name):
+        with self.lock:
+            stats = self.counters.get(prefix)
+            if stats is None:
+                stats = self.counters[prefix] = dict.fromkeys(STAT_NAMES, 0)
+            stats[name] += 1
+        metrics.count_cache(prefix, METRIC_RESULTS[name])
+
+    def seconds(self, timeout):
+        """Relative timeout in seconds (``get_backend_timeout()`` gives a timestamp)"""
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def entry_timeout(self, timeout):
+        """Seconds the shared cache keeps an entry expiring in ``timeout``"""
+        return None if timeout is None else timeout + self.stale_seconds
+
+    def new_entry(self, value, timeout, delta=0.0):
+        expires = math.inf if timeout is None else time.time() + timeout
+        return Entry(value, expires, delta)
+
+    # BaseCache API
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        entry = self.local_get(key)
+        if entry is None or entry.expires <= now:
+            entry = self.shared.get(key)
+            if entry is None or entry.expires <= now:
+                return default
+            self.local_set(key, entry)
+        return entry.value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self.seconds(timeout)
+        entry = self.new_entry(value, timeout)
+        self.shared.set(key, entry, self.entry_timeout(timeout))
+        self.local_set(key, entry)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        timeout = self.seconds(timeout)
+        entry = self.new_entry(value, timeout)
+        if not self.shared.add(key, entry, self.entry_timeout(timeout)):
+            return False
+        self.local_set(key, entry)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        entry = self.shared.get(key)
+        if entry is None:
+            return False
+        timeout = self.seconds(timeout)
+        entry = self.new_entry(entry.value, timeout, entry.delta)
+        self.shared.set(key, entry, self.entry_timeout(timeout))
+        self.local_set(key, entry)
+        return True
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self.local_delete(key)
+        return self.shared.delete(key)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self._missing_key, version=version) is not self._missing_key
+
+    def clear(self):
+        """Clear this process's tier and the shared cache"""
+        with self.lock:
+            self.local.clear()
+        self.shared.clear()
+
+    # Stampede protection
+
+    def lookup(self, key, prefix):
+        """The local entry and whether it can be served as is"""
+        now = time.time()
+        entry = self.local_get(key)
+        if entry is not None and entry.fresh(now, self.beta):
+            self.count(prefix, 'local_hits')
+            return entry, True
+        return entry, False
+
+    def after_shared(self, key, prefix, local_entry, shared_entry):
+        """The newer entry of both tiers and whether it can be served as is"""
+        entry = local_entry
+        if shared_entry is not None and (entry is None or shared_entry.expires > entry.expires):
+            entry = shared_entry
+            self.local_set(key, entry)
+        if entry is not None and entry.fresh(time.time(), self.beta):
+            self.count(prefix, 'shared_hits')
+            return entry, True
+        return entry, False
+
+    def store(self, key, value, timeout, delta):
+        entry = self.new_entry(value, timeout, delta)
+        self.local_set(key, entry)
+        return entry
+
+    def get_or_compute(self, key, compute, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Return the cached value of ``key``, calling ``compute()`` at most once
+        across workers. A ``timeout`` of 0 disables caching.
+        """
+        timeout = self.seconds(timeout)
+        if timeout == 0:
+            return compute()
+        prefix = key.split(':', 1)[0]
+        key = self.make_and_validate_key(key, version=version)
+        entry, ok = self.lookup(key, prefix)
+        if ok:
+            return entry.value
+        entry, ok = self.after_shared(key, prefix, entry, self.shared.get(key))
+        if ok:
+            return entry.value
+
+        lock_key = LOCK_PREFIX + key
+        locked = self.shared.add(lock_key, 1, self.lock_seconds)
+        if not locked:
+            if entry is not None and entry.expires + self.stale_seconds > time.time():
+                self.count(prefix, 'stale_hits')
+                return entry.value
+            # Nothing to serve: wait for the lock holder, or compute once it gave up.
+            self.count(prefix, 'waits')
+            deadline = time.monotonic() + self.lock_seconds
+            while True:
+                time.sleep(POLL_SECONDS)
+                shared_entry = self.shared.get(key)
+                if shared_entry is not None and shared_entry.expires > time.time():
+                    self.local_set(key, shared_entry)
+                    return shared_entry.value
+                if time.monotonic() >= deadline or self.shared.get(lock_key) is None:
+                    break
+        else:
+            self.count(prefix, 'misses' if entry is None or entry.expires <= time.time() else 'early_refreshes')
+
+        try:
+            start = time.perf_counter()
+            value = compute()
+            entry = self.store(key, value, timeout, time.perf_counter() - start)
+            self.shared.set(key, entry, self.entry_timeout(timeout))
+        finally:
+            if locked:
+                self.shared.delete(lock_key)
+        return value
+
+    async def aget_or_compute(self, key, compute, timeout=DEFAULT_TIMEOUT, version=None):
+        """``get_or_compute()`` for async callers; ``compute`` is a coroutine function"""
+        timeout = self.seconds(timeout)
+        if timeout == 0:
+            return await compute()
+        prefix = key.split(':', 1)[0]
+        key = self.make_and_validate_key(key, version=version)
+        entry, ok = self.lookup(key, prefix)
+        if ok:
+            return entry.value
+        entry, ok = self.after_shared(key, prefix, entry, await self.shared.aget(key))
+        if ok:
+            return entry.value
+
+        lock_key = LOCK_PREFIX + key
+        locked = await self.shared.aadd(lock_key, 1, self.lock_seconds)
+        if not locked:
+            if entry is not None and entry.expires + self.stale_seconds > time.time():
+                self.count(prefix, 'stale_hits')
+                return entry.value
+            # Nothing to serve: wait for the lock holder, or compute once it gave up.
+            self.count(prefix, 'waits')
+            deadline = time.monotonic() + self.lock_seconds
+            while True:
+                await asyncio.sleep(POLL_SECONDS)
+                shared_entry = await self.shared.aget(key)
+                if shared_entry is not None and shared_entry.expires > time.time():
+                    self.local_set(key, shared_entry)
+                    return shared_entry.value
+                if time.monotonic() >= deadline or await self.shared.aget(lock_key) is None:
+                    break
+        else:
+            self.count(prefix, 'misses' if entry is None or entry.expires <= time.time() else 'early_refreshes')
+
+        try:
+            start = time.perf_counter()
+            value = await compute()
+            entry = self.store(key, value, timeout, time.perf_counter() - start)
+            await self.shared.aset(key, entry, self.entry_timeout(timeout))
+        finally:
+            if locked:
+                await self.shared.adelete(lock_key)
+        return value
+
+    # Stats
+
+    def stats(self):
+        """Counters per key prefix for this process, with the hit ratio"""
+        with self.lock:
+            counters = {prefix: dict(stats) for prefix, stats in sorted(self.counters.items())}
+            local_entries = len(self.local)
+        for stats in counters.values():
+            hits = stats['local_hits'] + stats['shared_hits'] + stats['stale_hits']
+            total = hits + stats['misses'] + stats['early_refreshes'] + stats['waits']
+            stats['hit_ratio'] = round(hits / total, 3) if total else None
+        return {
+            'shared': self.shared_alias,
+            'local_entries': local_entries,
+            'max_local_entries': self.max_local,
+            'prefixes': counters,
+        }
+
+    def reset_stats(self):
+        with self.lock:
+            self.counters.clear()
+
+
+def hot_cache():
+    return caches['hot']
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from admin_app.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard counters row from the source tables"
+
+    def handle(self, *args, **options):
+        counters = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt dashboard counters: {counters.total_categories} categories, "
+            f"{counters.total_menu_items} menu items, {counters.active_bookings} active bookings, "
+            f"{counters.pending_orders} pending orders, {counters.new_messages} new messages, "
+            f"revenue {counters.total_revenue}"
+        ))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from admin_app.rollups import DEFAULT_LOOKBACK, refresh_rollups
+
+
+class Command(BaseCommand):
+    help = "Update the daily/hourly sales rollups from orders written since the last run"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute every day instead of only the days touched since the last run',
+        )
+        parser.add_argument(
+            '--lookback-hours', type=int, default=int(DEFAULT_LOOKBACK.total_seconds() // 3600),
+            help='Always recompute table orders created this many hours before the watermark',
+        )
+
+    def handle(self, *args, **options):
+        days = refresh_rollups(
+            full=options['full'],
+            lookback=timedelta(hours=options['lookback_hours']),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Recomputed sales rollups for {days} day(s)"))
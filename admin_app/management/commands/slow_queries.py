@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from admin_app.slow_queries import read_log, top_statements
+
+
+def most_common(counts, limit=3):
+    return ', '.join(
+        f"{value} ({count})"
+        for value, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+    ) or '-'
+
+
+class Command(BaseCommand):
+    help = "Print the slow queries captured in SLOW_QUERY_LOG, grouped by statement"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10, help='Number of statements to show')
+        parser.add_argument(
+            '--sort', choices=['total', 'max', 'mean', 'count'], default='total',
+            help='Order statements by total, max or mean time, or by count',
+        )
+        parser.add_argument('--hours', type=float, help='Only include queries from the last N hours')
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG, help='Slow query log to read')
+        parser.add_argument('--plans', action='store_true', help='Show the latest EXPLAIN plan of each statement')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['hours'] is not None:
+            since = (timezone.now() - timedelta(hours=options['hours'])).isoformat()
+        try:
+            queries, plans = read_log(options['log'], since)
+        except FileNotFoundError:
+            raise CommandError(f"No slow query log at {options['log']}; is SLOW_QUERY_MS set?")
+
+        statements = top_statements(queries, options['sort'])
+        self.stdout.write(f"{len(queries)} slow queries, {len(statements)} distinct statements")
+        for rank, group in enumerate(statements[:options['top']], 1):
+            self.stdout.write('')
+            self.stdout.write(self.style.WARNING(
+                f"#{rank} [{group['fingerprint']}] {group['count']} x, total {group['total_ms']:.1f} ms, "
+                f"mean {group['mean_ms']:.1f} ms, max {group['max_ms']:.1f} ms"
+            ))
+            self.stdout.write(f"  views:   {most_common(group['views'])}")
+            self.stdout.write(f"  fields:  {most_common(group['fields'])}")
+            self.stdout.write(f"  origins: {most_common(group['origins'])}")
+            self.stdout.write(f"  sql:     {group['sql']}")
+            plan = plans.get(group['fingerprint'])
+            if options['plans'] and plan is not None:
+                self.stdout.write(f"  plan of a {plan['ms']:.1f} ms run:")
+                for line in plan['plan'].splitlines():
+                    self.stdout.write(f"    {line}")
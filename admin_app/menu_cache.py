@@ -0,0 +1,92 @@
+"""
+Per-worker snapshot cache for the public menu endpoints.
+
+The menu is read on every QR scan but only changes a few times a day, so
+each worker keeps the rendered JSON bytes for the category and menu item
+lists. Snapshots are tagged with the menu version (see versions.py), which
+every worker reads with one primary key lookup per request; saving or
+deleting a Category or MenuItem bumps it and every worker rebuilds its
+snapshot on the next request. The rendered body of each
+version goes through the hot cache, so only one worker queries the menu
+tables for it.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from .hot_cache import hot_cache
+from .versions import MENU_VERSION, aget_version, bump_version
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+class MenuSnapshot:
+    """Rendered JSON body of a menu list at a given version"""
+    __slots__ = ('version', 'content', 'etag')
+
+    def __init__(self, version, content):
+        self.version = version
+        self.content = content
+        self.etag = '"%s"' % hashlib.sha1(content).hexdigest()
+
+
+async def aget_menu_version():
+    return await aget_version(MENU_VERSION)
+
+
+def bump_menu_version():
+    """Invalidate every worker's menu snapshots"""
+    bump_version(MENU_VERSION)
+
+
+async def aget_snapshot(name, build):
+    """
+    Return the snapshot called ``name``, rebuilding it with ``await build()``
+    when the menu version has moved. ``build`` returns serializer data.
+
+    Requests arriving while a snapshot is rebuilt may rebuild it as well;
+    the last one stored wins, and all of them hold the same version.
+    """
+    version = await aget_menu_version()
+    snapshot = _snapshots.get(name)
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    async def render():
+        return JSONRenderer().render(await build())
+    # Workers share the rendered body through the hot cache.
+    content = await hot_cache().aget_or_compute(
+        f'menu:{name}:{version}', render, settings.HOT_CACHE_TIMEOUTS['menu']
+    )
+    snapshot = MenuSnapshot(version, content)
+    with _lock:
+        _snapshots[name] = snapshot
+    return snapshot
+
+
+def snapshot_response(request, snapshot):
+    """Serve a snapshot, answering 304 when the client already has it"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        if '*' in etags or snapshot.etag in etags or ('W/' + snapshot.etag) in etags:
+            response = HttpResponse(status=304)
+            response['ETag'] = snapshot.etag
+            response['Cache-Control'] = 'no-cache'
+            return response
+
+    response = HttpResponse(snapshot.content, content_type='application/json')
+    response['ETag'] = snapshot.etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def clear_snapshots():
+    """Drop this worker's snapshots"""
+    with _lock:
+        _snapshots.clear()
@@ -0,0 +1,291 @@
+"""
+Prometheus metrics, served as text by ``GET /metrics`` while
+``settings.METRICS_ENABLED`` is set. The endpoint requires ``METRICS_TOKEN``
+unless DEBUG is on.
+
+Request metrics are recorded by PerformanceMiddleware (see perf.py) per
+URL name (``view`` label):
+
+- ``http_requests_total``, ``http_request_duration_seconds``
+- ``http_request_db_duration_seconds`` and ``db_queries_total``: time spent
+  in queries and their number
+
+Hot cache lookups are counted in ``cache_requests_total`` by key prefix and
+outcome, orders in ``restaurant_orders_created_total`` once their
+transaction commits, and acknowledged waiter requests in
+``restaurant_waiter_request_acknowledge_seconds``. Gauges read from the
+database at scrape time give the pending waiter request backlog, the orders
+created in the last minute and the mean time to acknowledge over the last
+hour.
+
+Counters and histograms live in this process. Gunicorn runs several
+workers and a scrape reaches only one of them, so with ``METRICS_DIR`` set
+each process also writes its values to its own file in that directory (a
+background thread rewrites it every ``METRICS_FLUSH_SECONDS`` after a
+change) and the scrape adds up the files of all processes. Files of workers
+that exited are kept so counters never go backwards; empty the directory
+when the service starts.
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Avg, DurationField, ExpressionWrapper, F
+from django.utils import timezone
+
+from .models import Order, OrderMenu, WaiterRequest
+
+# Upper bounds of the histogram buckets, in seconds.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ACKNOWLEDGE_BUCKETS = (5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+
+# name -> (type, help, buckets)
+FAMILIES = {
+    'http_requests_total': (
+        'counter', 'Requests served, by URL name, method and status code.', None),
+    'http_request_duration_seconds': (
+        'histogram', 'Time to build the response, by URL name and method.', DURATION_BUCKETS),
+    'http_request_db_duration_seconds': (
+        'histogram', 'Time spent in database queries per request, by URL name.', DURATION_BUCKETS),
+    'db_queries_total': (
+        'counter', 'Database queries run, by URL name.', None),
+    'cache_requests_total': (
+        'counter', 'Hot cache lookups, by key prefix and outcome.', None),
+    'restaurant_orders_created_total': (
+        'counter', 'Orders created, by kind (table or online).', None),
+    'restaurant_waiter_request_acknowledge_seconds': (
+        'histogram', 'Time from a waiter request to its acknowledgement.', ACKNOWLEDGE_BUCKETS),
+}
+
+CACHE_HITS = ('local_hit', 'shared_hit', 'stale_hit')
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', '') or None
+
+
+class Store:
+    """Counters and histograms of this process, mirrored to a file per process"""
+
+    def __init__(self):
+        self.reset()
+        os.register_at_fork(after_in_child=self.reset)
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        # (name, labels) -> bucket counts followed by the sum
+        self.histograms = {}
+        self.path = None
+        self.dirty = threading.Event()
+        self.flusher = None
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self.changed()
+
+    def observe(self, name, labels, value):
+        buckets = FAMILIES[name][2]
+        key = (name, labels)
+        with self.lock:
+            values = self.histograms.get(key)
+            if values is None:
+                values = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            values[bisect.bisect_left(buckets, value)] += 1
+            values[-1] += value
+        self.changed()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, labels, list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+    # Sharing across processes
+
+    def changed(self):
+        if self.flusher is None and metrics_dir():
+            self.start_flusher()
+        self.dirty.set()
+
+    def start_flusher(self):
+        with self.lock:
+            if self.flusher is not None:
+                return
+            self.path = os.path.join(metrics_dir(), f"{os.getpid()}-{time.time_ns()}.json")
+            self.flusher = threading.Thread(target=self.flush_forever, name='metrics-flush', daemon=True)
+        self.flusher.start()
+
+    def flush_forever(self):
+        dirty = self.dirty
+        interval = getattr(settings, 'METRICS_FLUSH_SECONDS', 1)
+        while dirty.wait():
+            dirty.clear()
+            self.flush()
+            time.sleep(interval)
+
+    def flush(self):
+        """Write this process's values to its file, replacing the previous ones"""
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(temp, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temp, self.path)
+
+    def collect(self):
+        """Values of all processes: this one from memory, the others from their files"""
+        snapshots = [self.snapshot()]
+        directory = metrics_dir()
+        if directory:
+            for path in glob.glob(os.path.join(directory, '*.json')):
+                if path == self.path:
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                total = histograms.get(key)
+                if total is None:
+                    histograms[key] = list(values)
+                else:
+                    histograms[key] = [a + b for a, b in zip(total, values)]
+        return counters, histograms
+
+
+store = Store()
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', False)
+
+
+# Recording
+
+def observe_request(request, response, timings):
+    match = getattr(request, 'resolver_match', None)
+    view = (match.url_name if match is not None else None) or 'unmatched'
+    store.inc('http_requests_total', (('view', view), ('method', request.method), ('status', str(response.status_code))))
+    store.observe('http_request_duration_seconds', (('view', view), ('method', request.method)), timings.ms['total'] / 1000)
+    store.observe('http_request_db_duration_seconds', (('view', view),), timings.ms['db'] / 1000)
+    if timings.queries:
+        store.inc('db_queries_total', (('view', view),), timings.queries)
+
+
+def count_cache(prefix, result):
+    if enabled():
+        store.inc('cache_requests_total', (('cache', 'hot'), ('prefix', prefix), ('result', result)))
+
+
+def count_order(kind):
+    if enabled():
+        store.inc('restaurant_orders_created_total', (('kind', kind),))
+
+
+def observe_acknowledged(waiter_request):
+    if enabled() and waiter_request.acknowledged_at:
+        seconds = (waiter_request.acknowledged_at - waiter_request.created_at).total_seconds()
+        store.observe('restaurant_waiter_request_acknowledge_seconds', (), max(seconds, 0))
+
+
+# Exposition
+
+def business_gauges():
+    """(name, help, labels, value) of the gauges read from the database"""
+    now = timezone.now()
+    mean = WaiterRequest.objects.filter(
+        acknowledged_at__gte=now - timedelta(hours=1)
+    ).aggregate(mean=Avg(ExpressionWrapper(F('acknowledged_at') - F('created_at'), output_field=DurationField())))['mean']
+    minute_ago = now - timedelta(minutes=1)
+    return [
+        ('restaurant_waiter_requests_pending', 'Waiter requests not yet acknowledged.', (),
+         WaiterRequest.objects.filter(status='pending').count()),
+        ('restaurant_waiter_request_acknowledge_seconds_mean',
+         'Mean time to acknowledge the waiter requests acknowledged in the last hour.', (),
+         mean.total_seconds() if mean is not None else float('nan')),
+        ('restaurant_orders_created_last_minute', 'Orders created in the last minute, by kind.', (('kind', 'table'),),
+         OrderMenu.objects.filter(created_at__gte=minute_ago).count()),
+        ('restaurant_orders_created_last_minute', None, (('kind', 'online'),),
+         Order.objects.filter(created_at__gte=minute_ago).count()),
+    ]
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def sample(name, labels, value):
+    if labels:
+        name += '{' + ','.join(f'{key}="{escape(val)}"' for key, val in labels) + '}'
+    if isinstance(value, float):
+        value = repr(value) if value == value else 'NaN'
+    return f"{name} {value}"
+
+
+def bound(value):
+    return repr(float(value))
+
+
+def cache_hit_ratios(counters):
+    """Hits over lookups per hot cache prefix, from the merged counters"""
+    prefixes = {}
+    for (name, labels), value in counters.items():
+        if name != 'cache_requests_total':
+            continue
+        labels = dict(labels)
+        hits, total = prefixes.get(labels['prefix'], (0, 0))
+        prefixes[labels['prefix']] = (hits + value * (labels['result'] in CACHE_HITS), total + value)
+    return sorted(prefixes.items())
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    counters, histograms = store.collect()
+    lines = []
+    for family, (kind, help_text, buckets) in FAMILIES.items():
+        lines += [f"# HELP {family} {help_text}", f"# TYPE {family} {kind}"]
+        if kind == 'counter':
+            lines += [
+                sample(family, labels, value)
+                for (name, labels), value in sorted(counters.items()) if name == family
+            ]
+            continue
+        for (name, labels), values in sorted(histograms.items()):
+            if name != family:
+                continue
+            cumulative = 0
+            for upper, count in zip((*map(bound, buckets), '+Inf'), values):
+                cumulative += count
+                lines.append(sample(f"{family}_bucket", labels + (('le', upper),), cumulative))
+            lines.append(sample(f"{family}_sum", labels, values[-1]))
+            lines.append(sample(f"{family}_count", labels, cumulative))
+
+    lines += ['# HELP cache_hit_ratio Share of hot cache lookups served from a cached entry, by key prefix.',
+              '# TYPE cache_hit_ratio gauge']
+    lines += [
+        sample('cache_hit_ratio', (('cache', 'hot'), ('prefix', prefix)), hits / total)
+        for prefix, (hits, total) in cache_hit_ratios(counters)
+    ]
+    for name, help_text, labels, value in business_gauges():
+        if help_text is not None:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        lines.append(sample(name, labels, value))
+    return '\n'.join(lines) + '\n'
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -18,7 +18,22 @@ PAYMENT_METHOD_CHOICES = [
     ]
 
 
-class Category(models.Model):
+class CountedModel(models.Model):
+    """
+    Saved in a transaction, so the dashboard counters (see counters.py) lock
+    the stored row and update in the same transaction as the write.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class Category(CountedModel):
     """Model for menu categories"""
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -34,7 +49,7 @@ class Category(models.Model):
         return self.name
 
 
-class MenuItem(models.Model):
+class MenuItem(CountedModel):
     """Model for menu items"""
 
     name = models.CharField(max_length=200)
@@ -53,7 +68,7 @@ class MenuItem(models.Model):
         return f"{self.name} - {self.category}"
 
 
-class ContactMessage(models.Model):
+class ContactMessage(CountedModel):
     """Model for contact form messages"""
     STATUS_CHOICES = [
         ('new', 'New'),
@@ -70,12 +85,20 @@ class ContactMessage(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='contact_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='contact_status_created_idx'),
+            models.Index(
+                fields=['-created_at', '-id'], name='contact_new_idx',
+                condition=models.Q(status='new'),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.status}"
 
 
-class Booking(models.Model):
+class Booking(CountedModel):
     """Model for table bookings"""
     STATUS_CHOICES = [
         ('new', 'New'),
@@ -96,12 +119,20 @@ class Booking(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='booking_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='booking_status_created_idx'),
+            models.Index(
+                fields=['-created_at', '-id'], name='booking_active_idx',
+                condition=models.Q(status__in=['new', 'confirmed']),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.date} {self.time}"
 
 
-class Order(models.Model):
+class Order(CountedModel):
     """Model for food orders"""
  
 
@@ -117,12 +148,20 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+            models.Index(
+                fields=['-created_at', '-id'], name='order_active_idx',
+                condition=models.Q(status__in=['pending', 'confirmed']),
+            ),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.customer_name}"
 
 class Table(models.Model):
-    number = models.CharField(max_length=100)
+    number = models.CharField(max_length=100, unique=True)
 
 class OrderMenu(models.Model):
     status = models.CharField(max_length=100, choices=STATUS_CHOICES, default='pending')
@@ -131,6 +170,16 @@ class OrderMenu(models.Model):
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES, default='cash')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='ordermenu_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='ordermenu_status_created_idx'),
+            models.Index(
+                fields=['-created_at', '-id'], name='ordermenu_active_idx',
+                condition=models.Q(status__in=['pending', 'confirmed', 'preparing', 'ready']),
+            ),
+        ]
+
 class orderMenuItem(models.Model):
     ordermenu = models.ForeignKey(OrderMenu,on_delete=models.CASCADE, related_name="ordering")
     item = models.ForeignKey(MenuItem,on_delete=models.CASCADE)
@@ -201,11 +250,108 @@ class WaiterRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='waiterreq_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='waiterreq_status_created_idx'),
+            models.Index(
+                fields=['-created_at', '-id'], name='waiterreq_open_idx',
+                condition=models.Q(status__in=['pending', 'acknowledged']),
+            ),
+        ]
 
     def __str__(self):
         return f"Table {self.table_number} - {self.status}"
 
 
+class DashboardCounters(models.Model):
+    """Running totals behind the dashboard, kept in a single row"""
+    total_categories = models.IntegerField(default=0)
+    total_menu_items = models.IntegerField(default=0)
+    active_bookings = models.IntegerField(default=0)
+    pending_orders = models.IntegerField(default=0)
+    new_messages = models.IntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Dashboard Counters"
+
+    def __str__(self):
+        return f"Dashboard counters ({self.updated_at})"
+
+
+class CacheVersion(models.Model):
+    """Counter bumped when the data behind a cached response changes, one row per cache"""
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cache version {self.pk}: {self.version}"
+
+
+class SalesHourlyRollup(models.Model):
+    """Order count and revenue per hour, payment method and status"""
+    SOURCE_CHOICES = [
+        ('order', 'Order'),
+        ('table', 'Table Order'),
+    ]
+
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date', 'hour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'hour', 'payment_method', 'status', 'source'],
+                name='sales_hourly_rollup_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.hour:02d}:00 {self.source} {self.payment_method} {self.status}"
+
+
+class MenuItemDailyRollup(models.Model):
+    """Quantity sold and revenue per menu item per day"""
+    date = models.DateField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'menu_item'], name='menu_item_daily_rollup_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.menu_item_id} x{self.quantity}"
+
+
+class RollupWatermark(models.Model):
+    """Point in time up to which a rollup has processed its source rows"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.value}"
+
+
+class RollupDirtyDay(models.Model):
+    """Day that lost an order since the last rollup run, so must be recomputed"""
+    date = models.DateField(unique=True)
+    marked_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.date} (marked {self.marked_at})"
+
+
 
 
 
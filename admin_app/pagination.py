@@ -0,0 +1,198 @@
+"""
+Keyset pagination for the list endpoints.
+
+Pages are addressed by an opaque cursor holding the ``(created_at, id)`` of
+the row at the page boundary, so fetching page 500 costs the same index
+range scan as page 1 and rows inserted meanwhile never shift a page.
+"""
+import base64
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .fast_serializers import render_json
+
+
+class KeysetPagination(BasePagination):
+    """Newest-first pagination on ``(created_at, id)``"""
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset()`` with the async ORM"""
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        """The page (plus one row, to tell whether there is more) as a queryset"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.direction, self.position = self.decode_cursor(request)
+
+        if self.direction == 'previous':
+            created_at, pk = self.position
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+            if self.position is not None:
+                created_at, pk = self.position
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                )
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if self.direction == 'previous':
+            rows.reverse()
+            self.has_previous = has_more
+            self.has_next = True
+        else:
+            self.has_previous = self.position is not None
+            self.has_next = has_more
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor('next', self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor('previous', self.page[0])
+
+    def encode_cursor(self, direction, row):
+        created_at, pk = row_key(row)
+        token = f"{direction[0]}|{created_at.isoformat()}|{pk}"
+        token = base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return 'next', None
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            direction, created_at, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None or direction not in ('n', 'p'):
+            raise NotFound(self.invalid_cursor_message)
+        return ('previous' if direction == 'p' else 'next'), (created_at, pk)
+
+
+def row_key(row):
+    """``(created_at, id)`` of a model instance or a ``.values()`` row"""
+    if isinstance(row, dict):
+        return row['created_at'], row['id']
+    return row.created_at, row.pk
+
+
+class KeysetPaginationMixin:
+    """
+    Adds keyset pagination to a plain APIView list endpoint.
+
+    Views listing small tables can set ``paginate_by_default = False``; they
+    then return the full list unless the client asks for a ``cursor`` or
+    ``page_size``. Views with a ``values_serializer`` (see fast_serializers)
+    build the page from ``.values()`` rows instead of model instances. Async
+    views (see views.AsyncReadView) use ``apaginated_response()``.
+    """
+    pagination_class = KeysetPagination
+    paginate_by_default = True
+    values_serializer = None
+
+    def should_paginate(self, request):
+        if self.paginate_by_default:
+            return True
+        paginator = self.pagination_class
+        params = request.query_params
+        return paginator.cursor_query_param in params or paginator.page_size_query_param in params
+
+    def paginated_response(self, request, queryset, serializer_class):
+        if self.values_serializer is not None:
+            return self.values_paginated_response(request, queryset)
+        if not self.should_paginate(request):
+            return Response(serializer_class(queryset, many=True).data)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(serializer_class(page, many=True).data)
+
+    async def apaginated_response(self, request, queryset, serializer_class):
+        """``paginated_response()`` for async views, reading with the async ORM"""
+        if not self.should_paginate(request):
+            data = serializer_class([row async for row in queryset], many=True).data
+        else:
+            paginator = self.pagination_class()
+            page = await paginator.apaginate_queryset(queryset, request, view=self)
+            data = OrderedDict([
+                ('next', paginator.get_next_link()),
+                ('previous', paginator.get_previous_link()),
+                ('results', serializer_class(page, many=True).data),
+            ])
+        return HttpResponse(render_json(data), content_type='application/json')
+
+    def values_paginated_response(self, request, queryset):
+        serializer = self.values_serializer
+        rows = serializer.values(queryset)
+        if not self.should_paginate(request):
+            content = render_json(serializer.serialize(rows))
+        else:
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(rows, request, view=self)
+            content = render_json({
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'results': serializer.serialize(page),
+            })
+        return HttpResponse(content, content_type='application/json')
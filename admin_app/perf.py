@@ -0,0 +1,258 @@
+"""
+Per-request performance instrumentation.
+
+When ``settings.PERF_ENABLED`` is set, PerformanceMiddleware times every
+request and breaks it down into:
+
+- ``db``: queries run and time spent in them, via ``execute_wrapper`` on
+  every database connection
+- ``serialize``: time spent building serializer ``.data`` (and the
+  ``.values()`` fast path)
+- ``render``: time spent encoding the response body
+
+The breakdown is sent back in a ``Server-Timing`` header and added to
+in-memory histograms per route, served by ``/api/_perf``. Histograms are
+kept per process.
+
+With ``settings.METRICS_ENABLED`` the middleware also records the total and
+database time of each request for ``/metrics`` (see metrics.py), and with
+``settings.SLOW_QUERY_MS`` its execute wrapper captures slow queries (see
+slow_queries.py).
+
+When all three settings are off the middleware removes itself at startup and the
+serializer and renderer hooks are never installed; the explicit ``span()``
+calls left in the code then cost a context variable lookup.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics, slow_queries
+
+PHASES = ('total', 'db', 'serialize', 'render')
+# Upper bounds of the histogram buckets, in milliseconds and in queries.
+MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+_current = contextvars.ContextVar('perf_timings', default=None)
+
+
+class RequestTimings:
+    """Timings collected for the request being served"""
+
+    def __init__(self, request=None, slow_ms=None):
+        self.start = time.perf_counter()
+        self.ms = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+        self.depth = {}
+        self.request = request
+        self.slow_ms = slow_ms
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            self.ms['db'] += ms
+            self.queries += 1
+            if self.slow_ms is not None and ms >= self.slow_ms:
+                slow_queries.record(self.request, sql, params, many, context, ms)
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.ms["db"]:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.ms["serialize"]:.1f}',
+            f'render;dur={self.ms["render"]:.1f}',
+            f'total;dur={self.ms["total"]:.1f}',
+        ])
+
+
+@contextmanager
+def span(phase):
+    """Add the time spent in the block to ``phase``; nested spans count once"""
+    timings = _current.get()
+    if timings is None or timings.depth.get(phase):
+        yield
+        return
+    timings.depth[phase] = 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.ms[phase] += (time.perf_counter() - start) * 1000
+        timings.depth[phase] = 0
+
+
+def timed_property(prop, phase):
+    def fget(self):
+        with span(phase):
+            return prop.fget(self)
+    return property(fget)
+
+
+_instrumented = False
+
+
+def instrument_drf():
+    """Time DRF serializer ``.data`` and response rendering"""
+    global _instrumented
+    if _instrumented:
+        return
+    from rest_framework.response import Response
+    from rest_framework.serializers import BaseSerializer
+
+    BaseSerializer.data = timed_property(BaseSerializer.data, 'serialize')
+    Response.rendered_content = timed_property(Response.rendered_content, 'render')
+    _instrumented = True
+
+
+class Histogram:
+    """Bucketed counts with a running sum"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the ``q`` quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean': round(self.sum / self.count, 2) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': {
+                **{str(bound): count for bound, count in zip(self.bounds, self.counts)},
+                '+Inf': self.counts[-1],
+            },
+        }
+
+
+class Registry:
+    """Histograms per route, for this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def observe(self, route, timings, status_code):
+        with self.lock:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = {
+                    'statuses': {},
+                    'queries': Histogram(QUERY_BUCKETS),
+                    **{phase: Histogram(MS_BUCKETS) for phase in PHASES},
+                }
+            for phase in PHASES:
+                stats[phase].observe(timings.ms[phase])
+            stats['queries'].observe(timings.queries)
+            stats['statuses'][status_code] = stats['statuses'].get(status_code, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                route: {
+                    'statuses': dict(stats['statuses']),
+                    **{key: stats[key].as_dict() for key in ('queries', *PHASES)},
+                }
+                for route, stats in sorted(self.routes.items())
+            }
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+
+
+registry = Registry()
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    route = match.route if match is not None else 'unmatched'
+    return f"{request.method} /{route}"
+
+
+class PerformanceMiddleware:
+    """Collects the per-request timings described in the module docstring"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.timing = getattr(settings, 'PERF_ENABLED', False)
+        self.metrics = metrics.enabled()
+        self.slow_ms = slow_queries.threshold_ms()
+        if not (self.timing or self.metrics or self.slow_ms):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        if self.timing:
+            instrument_drf()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings(request, self.slow_ms)
+        token = _current.set(timings)
+        try:
+            with self.wrap_connections(timings):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings(request, self.slow_ms)
+        token = _current.set(timings)
+        # Connections are per thread; sync code of this request runs in
+        # the thread-sensitive executor, so install the wrappers there.
+        stack = await sync_to_async(self.wrap_connections, thread_sensitive=True)(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close, thread_sensitive=True)()
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def wrap_connections(self, timings):
+        """Enter ``execute_wrapper`` on this thread's connections"""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timings.db_wrapper))
+        return stack
+
+    def finish(self, request, response, timings):
+        timings.ms['total'] = (time.perf_counter() - timings.start) * 1000
+        if self.timing:
+            response['Server-Timing'] = timings.server_timing()
+            registry.observe(route_name(request), timings, response.status_code)
+        if self.metrics:
+            metrics.observe_request(request, response, timings)
+        return response
@@ -0,0 +1,30 @@
+"""
+Role based permissions.
+
+Roles are read from the ``role`` claim of the access token (see
+authentication.py), so these checks do not query AdminUser.
+"""
+from rest_framework.permissions import BasePermission
+
+
+class HasRole(BasePermission):
+    """Allow authenticated users whose role is in ``allowed_roles``"""
+    allowed_roles = ()
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+        return getattr(user, 'role', None) in self.allowed_roles
+
+
+class IsAdminRole(HasRole):
+    allowed_roles = ('admin',)
+
+
+class IsManagerRole(HasRole):
+    allowed_roles = ('admin', 'manager')
+
+
+class IsStaffRole(HasRole):
+    allowed_roles = ('admin', 'manager', 'waiter', 'kitchen_staff')
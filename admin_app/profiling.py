@@ -0,0 +1,218 @@
+"""
+Opt-in request profiler.
+
+Views using ProfiledMixin profile a request when:
+
+- it carries an ``X-Profile`` header and an admin access token, or
+- it is picked by sampling: one request in ``PROFILE_SAMPLE_RATE`` (0 turns
+  sampling off).
+
+The profiler is statistical: a thread records the stacks of the threads
+serving the request every ``PROFILE_INTERVAL_MS``, which costs the same
+whatever the code does and sees time spent waiting on the database. An
+async view runs on the event loop and in the thread-sensitive executor, so
+both threads are sampled and show up as separate profiles.
+
+Each profile is written to ``PROFILE_DIR/<url name>/`` in the speedscope
+format (open it at https://www.speedscope.app), keeping the newest
+``PROFILE_KEEP`` per URL name. The response names the file in its
+``X-Profile`` header; ``/api/_perf/profiles`` lists and serves the files.
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import StatelessJWTAuthentication
+
+HEADER = 'X-Profile'
+SUFFIX = '.speedscope.json'
+# URL names and file names accepted by the download view
+NAME = re.compile(r'^[\w-][\w.-]*$')
+
+
+def profile_dir():
+    return getattr(settings, 'PROFILE_DIR', 'profiles')
+
+
+def is_admin(request):
+    try:
+        result = StatelessJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return result is not None and getattr(result[0], 'role', None) == 'admin'
+
+
+def should_profile(request):
+    if HEADER in request.headers and is_admin(request):
+        return True
+    rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+    return rate > 0 and random.randrange(rate) == 0
+
+
+class Sampler:
+    """Records the stacks of ``threads`` every ``interval`` seconds until stopped"""
+
+    def __init__(self, threads, interval):
+        self.threads = {ident: name for ident, name in threads}
+        self.interval = interval
+        self.samples = {ident: [] for ident in self.threads}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='profiler', daemon=True)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+        self.ms = (time.perf_counter() - self.start) * 1000
+
+    def run(self):
+        last = self.start
+        while not self.stopped.wait(self.interval):
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            for ident, samples in self.samples.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    samples.append((stack(frame), (now - last) * 1000))
+            last = now
+
+    def speedscope(self, name):
+        """The samples as a speedscope file, one profile per thread"""
+        frames, index = [], {}
+        profiles = []
+        for ident, samples in self.samples.items():
+            stacks, weights = [], []
+            for frame_stack, weight in samples:
+                indexes = []
+                for frame in frame_stack:
+                    if frame not in index:
+                        index[frame] = len(frames)
+                        frames.append({'name': frame[2], 'file': frame[0], 'line': frame[1]})
+                    indexes.append(index[frame])
+                stacks.append(indexes)
+                weights.append(round(weight, 3))
+            profiles.append({
+                'type': 'sampled',
+                'name': f"{name} ({self.threads[ident]})",
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': round(sum(weights), 3),
+                'samples': stacks,
+                'weights': weights,
+            })
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'restaurant-admin',
+            'activeProfileIndex': 0,
+            'shared': {'frames': frames},
+            'profiles': profiles,
+        }
+
+
+def stack(frame):
+    """``(file, first line, function)`` of each frame, outermost first"""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def interval():
+    return getattr(settings, 'PROFILE_INTERVAL_MS', 1) / 1000
+
+
+def save(sampler, request, response):
+    """Write the profile under the request's URL name and name it in the response"""
+    match = getattr(request, 'resolver_match', None)
+    url_name = (match.url_name if match is not None else None) or 'unmatched'
+    directory = os.path.join(profile_dir(), url_name)
+    os.makedirs(directory, exist_ok=True)
+    filename = (
+        f"{timezone.now():%Y%m%dT%H%M%S}-{os.getpid()}-{random.getrandbits(16):04x}-"
+        f"{sampler.ms:.0f}ms{SUFFIX}"
+    )
+    name = f"{request.method} {request.get_full_path()} {response.status_code} {sampler.ms:.1f} ms"
+    with open(os.path.join(directory, filename), 'w') as f:
+        json.dump(sampler.speedscope(name), f)
+    prune(directory)
+    response[HEADER] = f"{url_name}/{filename}"
+    return response
+
+
+def prune(directory):
+    """Keep the newest ``PROFILE_KEEP`` profiles of a URL name"""
+    keep = getattr(settings, 'PROFILE_KEEP', 50)
+    names = sorted(name for name in os.listdir(directory) if name.endswith(SUFFIX))
+    for name in names[:-keep]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+
+def list_profiles():
+    """Profiles on disk per URL name, newest first"""
+    root = profile_dir()
+    if not os.path.isdir(root):
+        return {}
+    profiles = {}
+    for url_name in sorted(os.listdir(root)):
+        directory = os.path.join(root, url_name)
+        if not os.path.isdir(directory):
+            continue
+        profiles[url_name] = [
+            {'id': f"{url_name}/{name}", 'size': os.path.getsize(os.path.join(directory, name))}
+            for name in sorted(os.listdir(directory), reverse=True) if name.endswith(SUFFIX)
+        ]
+    return profiles
+
+
+def profile_path(url_name, filename):
+    """Path of a stored profile, or None for names that are not one"""
+    if not (NAME.match(url_name) and NAME.match(filename) and filename.endswith(SUFFIX)):
+        return None
+    path = os.path.join(profile_dir(), url_name, filename)
+    return path if os.path.isfile(path) else None
+
+
+def delete_profiles():
+    for url_name, profiles in list_profiles().items():
+        for profile in profiles:
+            os.remove(os.path.join(profile_dir(), profile['id']))
+
+
+class ProfiledMixin:
+    """Profiles the requests picked by ``should_profile()``"""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not should_profile(request):
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self.profiled(request, *args, **kwargs)
+        with Sampler([(threading.get_ident(), 'request')], interval()) as sampler:
+            response = super().dispatch(request, *args, **kwargs)
+        return save(sampler, request, response)
+
+    async def profiled(self, request, *args, **kwargs):
+        executor = await sync_to_async(threading.get_ident, thread_sensitive=True)()
+        threads = [(threading.get_ident(), 'event loop'), (executor, 'sync')]
+        with Sampler(threads, interval()) as sampler:
+            response = await super().dispatch(request, *args, **kwargs)
+        return await sync_to_async(save, thread_sensitive=True)(sampler, request, response)
@@ -0,0 +1,150 @@
+"""
+Sales rollups for reporting.
+
+``refresh_rollups`` finds the days touched since the last run (the
+watermark), deletes their rollup rows and aggregates them again from
+Order/OrderItem and OrderMenu/orderMenuItem. Recomputing whole days keeps
+the command idempotent: running it twice gives the same rows.
+
+Order has ``updated_at``, so status changes on old orders are picked up.
+A deleted Order leaves nothing to compare with the watermark, so a
+post_delete receiver marks its day in RollupDirtyDay (see
+``mark_deleted_order``). OrderMenu has neither, so days inside the lookback
+window are always recomputed to catch kitchen status changes and deletions.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import (
+    MenuItemDailyRollup, Order, OrderItem, OrderMenu, RollupDirtyDay,
+    RollupWatermark, SalesHourlyRollup, orderMenuItem
+)
+
+WATERMARK_NAME = 'sales'
+DEFAULT_LOOKBACK = timedelta(hours=48)
+EXCLUDED_ITEM_STATUSES = ['cancelled']
+
+
+def day_bounds(day):
+    """Aware datetimes bounding ``day`` in the current time zone"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def mark_deleted_order(order):
+    """Have the next run recompute the day of a deleted order"""
+    RollupDirtyDay.objects.update_or_create(
+        date=timezone.localdate(order.created_at), defaults={'marked_at': timezone.now()}
+    )
+
+
+def _days(queryset):
+    # order_by() drops Meta.ordering, which would otherwise be added to the
+    # DISTINCT and return one row per order.
+    return set(
+        queryset.annotate(day=TruncDate('created_at'))
+        .order_by().values_list('day', flat=True).distinct()
+    )
+
+
+def dirty_days(since, lookback=DEFAULT_LOOKBACK):
+    """Days whose rollups may be stale since the watermark ``since``"""
+    days = _days(Order.objects.filter(updated_at__gte=since))
+    days |= _days(OrderMenu.objects.filter(created_at__gte=since - lookback))
+    days.update(RollupDirtyDay.objects.values_list('date', flat=True))
+    return days
+
+
+def all_days():
+    return _days(Order.objects.all()) | _days(OrderMenu.objects.all())
+
+
+def _line_revenue():
+    return ExpressionWrapper(
+        F('price') * F('quantity'),
+        output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+
+
+def aggregate_day(day):
+    """Build the rollup rows for one day"""
+    start, end = day_bounds(day)
+
+    hourly = []
+    for source, queryset, total_field in (
+        ('order', Order.objects.filter(created_at__gte=start, created_at__lt=end), 'total'),
+        ('table', OrderMenu.objects.filter(created_at__gte=start, created_at__lt=end), 'total_price'),
+    ):
+        rows = (
+            queryset.annotate(hour=ExtractHour('created_at'))
+            .values('hour', 'payment_method', 'status')
+            .annotate(orders=Count('id'), revenue=Sum(total_field))
+            .order_by()
+        )
+        hourly.extend(
+            SalesHourlyRollup(
+                date=day, hour=row['hour'], payment_method=row['payment_method'],
+                status=row['status'], source=source,
+                orders=row['orders'], revenue=row['revenue'] or 0,
+            )
+            for row in rows
+        )
+
+    items = {}
+    for queryset, item_field in (
+        (OrderItem.objects.filter(order__created_at__gte=start, order__created_at__lt=end)
+         .exclude(order__status__in=EXCLUDED_ITEM_STATUSES), 'menu_item_id'),
+        (orderMenuItem.objects.filter(ordermenu__created_at__gte=start, ordermenu__created_at__lt=end)
+         .exclude(ordermenu__status__in=EXCLUDED_ITEM_STATUSES), 'item_id'),
+    ):
+        rows = (
+            queryset.values(item_field)
+            .annotate(sold=Sum('quantity'), line_revenue=Sum(_line_revenue()))
+            .order_by()
+        )
+        for row in rows:
+            rollup = items.setdefault(
+                row[item_field], MenuItemDailyRollup(date=day, menu_item_id=row[item_field])
+            )
+            rollup.quantity += row['sold'] or 0
+            rollup.revenue += row['line_revenue'] or 0
+
+    return hourly, list(items.values())
+
+
+def refresh_rollups(full=False, lookback=DEFAULT_LOOKBACK):
+    """
+    Bring the rollups up to date and return the number of days recomputed.
+    Rows written while the command runs are picked up by the next run.
+    """
+    started_at = timezone.now()
+    watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).first()
+
+    if full or watermark is None:
+        days = all_days()
+    else:
+        days = dirty_days(watermark.value, lookback)
+
+    for day in sorted(days):
+        hourly, items = aggregate_day(day)
+        with transaction.atomic():
+            SalesHourlyRollup.objects.filter(date=day).delete()
+            MenuItemDailyRollup.objects.filter(date=day).delete()
+            SalesHourlyRollup.objects.bulk_create(hourly)
+            MenuItemDailyRollup.objects.bulk_create(items)
+
+    if full:
+        # Drop days that no longer have any source rows.
+        SalesHourlyRollup.objects.exclude(date__in=days).delete()
+        MenuItemDailyRollup.objects.exclude(date__in=days).delete()
+    # Days marked while this run was going are kept for the next one.
+    RollupDirtyDay.objects.filter(marked_at__lt=started_at).delete()
+
+    RollupWatermark.objects.update_or_create(
+        name=WATERMARK_NAME, defaults={'value': started_at}
+    )
+    return len(days)
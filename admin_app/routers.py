@@ -0,0 +1,100 @@
+"""
+Read-replica routing.
+
+When ``settings.DATABASES`` has a ``replica`` alias (set by
+``REPLICA_DATABASE_URL``), ReplicaRoutingMiddleware marks GET, HEAD and
+OPTIONS requests as replica reads and PrimaryReplicaRouter sends their
+queries there. Everything else, and all writes, use ``default``.
+
+A replica lags behind the primary, so a client that just wrote would not
+see its own change on the next read. After a POST, PUT, PATCH or DELETE
+the middleware sets a cookie that keeps that client's reads on the primary
+for ``REPLICA_STICKY_SECONDS``. The frontend is on another site, so the
+cookie is ``SameSite=None; Secure`` (``REPLICA_STICKY_SECURE``) and the
+frontend must send credentials with its requests.
+"""
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+REPLICA = 'replica'
+STICKY_COOKIE = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+class PrimaryReplicaRouter:
+    """Reads of replica-marked requests go to the replica, the rest to default"""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_configured():
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+
+def reads_from_replica(request):
+    """Whether ``request`` may read from the replica"""
+    if request.method not in SAFE_METHODS:
+        return False
+    try:
+        primary_until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+    except ValueError:
+        return True
+    return primary_until < time.time()
+
+
+class ReplicaRoutingMiddleware:
+    """Marks safe requests as replica reads and makes writers sticky to the primary"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _use_replica.set(reads_from_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = _use_replica.set(reads_from_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        if request.method not in SAFE_METHODS and replica_configured():
+            seconds = sticky_seconds()
+            secure = getattr(settings, 'REPLICA_STICKY_SECURE', True)
+            response.set_cookie(
+                STICKY_COOKIE, f"{time.time() + seconds:.0f}",
+                max_age=seconds, httponly=True, secure=secure, samesite='None' if secure else 'Lax',
+            )
+        return response
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from . import counters, metrics, rollups
+from .menu_cache import bump_menu_version
+from .models import Category, MenuItem, Order, OrderMenu, orderMenuItem
+from .versions import KITCHEN_VERSION, bump_version
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def invalidate_menu_snapshot(sender, **kwargs):
+    """Bump the menu version once the change is visible to other workers"""
+    transaction.on_commit(bump_menu_version)
+
+
+@receiver(post_save, sender=OrderMenu)
+@receiver(post_delete, sender=OrderMenu)
+@receiver(post_save, sender=orderMenuItem)
+@receiver(post_delete, sender=orderMenuItem)
+def invalidate_kitchen_list(sender, **kwargs):
+    """Move the cached kitchen lists to new keys once the change is committed"""
+    transaction.on_commit(lambda: bump_version(KITCHEN_VERSION))
+
+
+@receiver(post_save, sender=OrderMenu)
+@receiver(post_save, sender=Order)
+def count_created_order(sender, instance, created, raw=False, **kwargs):
+    """Count new orders in /metrics once they are committed"""
+    if created and not raw:
+        kind = 'table' if sender is OrderMenu else 'online'
+        transaction.on_commit(lambda: metrics.count_order(kind))
+
+
+@receiver(post_delete, sender=Order)
+def mark_rollup_day(sender, instance, **kwargs):
+    """Deleted orders leave no updated_at behind for the rollups to find"""
+    rollups.mark_deleted_order(instance)
+
+
+def load_counter_state(sender, instance, using, raw=False, **kwargs):
+    if not raw:
+        counters.load_state(instance, using)
+
+
+def lock_counter_state(sender, instance, using, **kwargs):
+    counters.load_state(instance, using, deleting=True)
+
+
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        counters.after_save(instance, created)
+
+
+def update_counters_on_delete(sender, instance, **kwargs):
+    counters.after_delete(instance)
+
+
+for model in counters.TRACKED_MODELS:
+    pre_save.connect(load_counter_state, sender=model)
+    pre_delete.connect(lock_counter_state, sender=model)
+    post_save.connect(update_counters_on_save, sender=model)
+    post_delete.connect(update_counters_on_delete, sender=model)
@@ -0,0 +1,171 @@
+"""
+Request coalescing (single flight) for polled read endpoints.
+
+When many tablets refresh at once they send the same GET at the same time.
+Views using SingleFlightMixin let the first of a group of identical
+requests (same host, path, query string and auth scope) compute the
+response while the others wait for it and get a copy of its status,
+content type and body. Nothing is kept once the computation finishes: a
+request arriving afterwards starts a new flight. Clients that just wrote
+(see routers.py) never join a flight, as it may have started before their
+write.
+
+Within a process, waiters share a ``concurrent.futures.Future``, which
+works across threads and across the event loops Django runs async views
+in. With ``SINGLE_FLIGHT['SHARED']`` the leader of each process also takes
+a lock in the cache named by ``SINGLE_FLIGHT['CACHE']``; the leaders of
+other processes then wait for the winner to publish the body there instead
+of computing it themselves.
+
+If the leader fails, its waiters compute their own responses.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import StatelessJWTAuthentication
+from .routers import reads_from_replica
+
+DEFAULTS = {
+    'SHARED': False,
+    'CACHE': 'default',
+    'WAIT_SECONDS': 5,
+}
+KEY_PREFIX = 'single-flight:'
+POLL_SECONDS = 0.02
+STAT_NAMES = ('leaders', 'followers', 'shared_followers', 'failures')
+
+
+def get_setting(name):
+    return getattr(settings, 'SINGLE_FLIGHT', {}).get(name, DEFAULTS[name])
+
+
+class Flights:
+    """In-flight computations of this process, by request key"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.counters = dict.fromkeys(STAT_NAMES, 0)
+
+    def join(self, key):
+        """The future of ``key`` and whether the caller leads the flight"""
+        with self.lock:
+            future = self.inflight.get(key)
+            if future is not None:
+                self.counters['followers'] += 1
+                return future, False
+            future = self.inflight[key] = Future()
+            self.counters['leaders'] += 1
+            return future, True
+
+    def land(self, key, future, result):
+        with self.lock:
+            del self.inflight[key]
+            if result is None:
+                self.counters['failures'] += 1
+        future.set_result(result)
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    async def run(self, key, compute):
+        """Return ``await compute()`` for the leader, a copy of its response for the others"""
+        future, leader = self.join(key)
+        if not leader:
+            shared = await asyncio.wrap_future(future)
+            return await compute() if shared is None else copy_response(shared)
+
+        shared = None
+        try:
+            locked = False
+            if get_setting('SHARED'):
+                locked, shared = await self.lock_or_wait(key)
+                if shared is not None:
+                    return copy_response(shared)
+            try:
+                response = await compute()
+                if not getattr(response, 'streaming', False):
+                    shared = (response.status_code, response['Content-Type'], response.content)
+            finally:
+                if locked:
+                    await self.publish(key, shared)
+            return response
+        finally:
+            self.land(key, future, shared)
+
+    async def lock_or_wait(self, key):
+        """
+        Take the cross-process lock for ``key``, or wait for the response its
+        holder publishes. Returns ``(locked, shared response or None)``.
+        """
+        cache = caches[get_setting('CACHE')]
+        wait_seconds = get_setting('WAIT_SECONDS')
+        if await cache.aadd(KEY_PREFIX + 'lock:' + key, 1, wait_seconds):
+            return True, None
+        arrived = time.time()
+        deadline = time.monotonic() + wait_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POLL_SECONDS)
+            published = await cache.aget(KEY_PREFIX + 'result:' + key)
+            # Only a flight that finished after this request arrived counts.
+            if published is not None and published[0] >= arrived:
+                self.count('shared_followers')
+                return False, published[1]
+            if await cache.aget(KEY_PREFIX + 'lock:' + key) is None:
+                break
+        return False, None
+
+    async def publish(self, key, shared):
+        """Hand the response to other processes and release the lock"""
+        cache = caches[get_setting('CACHE')]
+        if shared is not None:
+            await cache.aset(KEY_PREFIX + 'result:' + key, (time.time(), shared), get_setting('WAIT_SECONDS'))
+        await cache.adelete(KEY_PREFIX + 'lock:' + key)
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, 'in_flight': len(self.inflight)}
+
+    def reset(self):
+        with self.lock:
+            self.counters = dict.fromkeys(STAT_NAMES, 0)
+
+
+flights = Flights()
+
+
+def copy_response(shared):
+    status_code, content_type, content = shared
+    return HttpResponse(content, status=status_code, content_type=content_type)
+
+
+def auth_scope(request):
+    """Requests share a flight only with requests of the same role"""
+    try:
+        result = StatelessJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return 'invalid'
+    if result is None:
+        return 'anonymous'
+    return getattr(result[0], 'role', None) or 'user'
+
+
+class SingleFlightMixin:
+    """Coalesces identical concurrent GETs of an AsyncReadView"""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or not reads_from_replica(request):
+            return super().dispatch(request, *args, **kwargs)
+        return self.coalesced(request, *args, **kwargs)
+
+    async def coalesced(self, request, *args, **kwargs):
+        key = f"{auth_scope(request)}|{request.get_host()}{request.get_full_path()}"
+        return await flights.run(key, lambda: super(SingleFlightMixin, self).dispatch(request, *args, **kwargs))
@@ -0,0 +1,245 @@
+"""
+Slow query capture.
+
+With ``settings.SLOW_QUERY_MS`` above 0, every query a request runs that
+takes at least that long is logged (``admin_app.slow_queries`` logger) and
+appended as a JSON line to ``SLOW_QUERY_LOG``, together with:
+
+- the URL name of the view that ran it
+- the chain of serializer fields being rendered when it ran (e.g.
+  ``OrderSerializer.items > OrderItemSerializer.menu_item``), found by
+  walking the stack only once a query is known to be slow
+- the innermost line of admin_app code on the stack
+
+Queries are timed by PerformanceMiddleware's execute wrapper (see
+perf.py), so only queries run while serving requests are seen. Parameters
+are never written, as they hold customer data.
+
+On PostgreSQL, with ``SLOW_QUERY_EXPLAIN``, the slowest run of each SELECT
+seen by a process is re-run under ``EXPLAIN (ANALYZE, BUFFERS)`` by a
+background thread, at most once per statement every
+``SLOW_QUERY_EXPLAIN_SECONDS``, inside a transaction that is rolled back.
+Plans are appended to the same file.
+
+``python manage.py slow_queries`` prints the statements with the most time
+spent, grouped by fingerprint (the SQL with lists of placeholders, as in
+``IN (%s, %s)`` or ``VALUES``, collapsed).
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+INSTRUMENTATION = ('perf.py', 'slow_queries.py')
+EXPLAIN_QUEUE_SIZE = 10
+
+
+def threshold_ms():
+    """Queries at least this slow are captured; None when capture is off"""
+    ms = getattr(settings, 'SLOW_QUERY_MS', 0)
+    return ms if ms > 0 else None
+
+
+def log_path():
+    return getattr(settings, 'SLOW_QUERY_LOG', 'slow_queries.jsonl')
+
+
+def fingerprint(sql):
+    """The statement with placeholder lists collapsed, and a short hash of it"""
+    statement = PLACEHOLDER_LIST.sub('(%s, ...)', ' '.join(sql.split()))
+    return statement, hashlib.sha1(statement.encode()).hexdigest()[:12]
+
+
+def serializer_fields(frame):
+    """Serializer fields being rendered on the stack, outermost first"""
+    from rest_framework.serializers import BaseSerializer
+
+    fields = []
+    while frame is not None:
+        if frame.f_code.co_name == 'to_representation':
+            serializer = frame.f_locals.get('self')
+            field = frame.f_locals.get('field')
+            if isinstance(serializer, BaseSerializer) and getattr(field, 'field_name', None):
+                fields.append(f"{type(serializer).__name__}.{field.field_name}")
+        frame = frame.f_back
+    return ' > '.join(reversed(fields)) or None
+
+
+def origin(frame):
+    """``file:line in function`` of the innermost admin_app frame outside the instrumentation"""
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and not filename.endswith(INSTRUMENTATION):
+            path = os.path.relpath(filename, os.path.dirname(APP_DIR))
+            return f"{path}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def append(entry):
+    """Add one JSON line to the log; a single O_APPEND write keeps processes from interleaving"""
+    line = (json.dumps(entry, default=str) + '\n').encode()
+    try:
+        fd = os.open(log_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+    except OSError:
+        logger.exception("Could not write to the slow query log %s", log_path())
+
+
+def record(request, sql, params, many, context, ms):
+    """Capture a query that took ``ms`` milliseconds"""
+    frame = sys._getframe(1)
+    statement, key = fingerprint(sql)
+    match = getattr(request, 'resolver_match', None)
+    connection = context['connection']
+    entry = {
+        'type': 'query',
+        'at': timezone.now().isoformat(),
+        'pid': os.getpid(),
+        'ms': round(ms, 2),
+        'fingerprint': key,
+        'sql': statement,
+        'many': many,
+        'alias': connection.alias,
+        'view': match.url_name if match is not None else None,
+        'method': request.method,
+        'path': request.path,
+        'fields': serializer_fields(frame),
+        'origin': origin(frame),
+    }
+    logger.warning(
+        "Slow query (%.1f ms) in %s via %s at %s: %s",
+        ms, entry['view'] or request.path, entry['fields'] or '-', entry['origin'] or '-', statement[:500],
+    )
+    append(entry)
+    if not many:
+        explainer.consider(key, connection, sql, params, ms)
+
+
+class Explainer:
+    """Samples EXPLAIN (ANALYZE, BUFFERS) plans of the slowest SELECTs in a background thread"""
+
+    def __init__(self):
+        self.reset()
+        os.register_at_fork(after_in_child=self.reset)
+
+    def reset(self):
+        self.lock = threading.Lock()
+        # fingerprint -> (slowest ms explained, when)
+        self.explained = {}
+        self.queue = queue.Queue(EXPLAIN_QUEUE_SIZE)
+        self.thread = None
+
+    def consider(self, key, connection, sql, params, ms):
+        if not getattr(settings, 'SLOW_QUERY_EXPLAIN', False) or connection.vendor != 'postgresql':
+            return
+        # ANALYZE runs the statement, so never anything that could write.
+        if sql.lstrip()[:6].upper() != 'SELECT':
+            return
+        now = time.monotonic()
+        interval = getattr(settings, 'SLOW_QUERY_EXPLAIN_SECONDS', 600)
+        with self.lock:
+            worst, at = self.explained.get(key, (0, -interval))
+            if ms <= worst and now - at < interval:
+                return
+            self.explained[key] = (ms, now)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.work, name='slow-query-explain', daemon=True)
+                self.thread.start()
+        try:
+            self.queue.put_nowait((key, connection.alias, sql, params, ms))
+        except queue.Full:
+            pass
+
+    def work(self):
+        while True:
+            key, alias, sql, params, ms = self.queue.get()
+            plan = explain(alias, sql, params, ms)
+            if plan is not None:
+                append({
+                    'type': 'explain',
+                    'at': timezone.now().isoformat(),
+                    'fingerprint': key,
+                    'ms': round(ms, 2),
+                    'plan': plan,
+                })
+
+
+def explain(alias, sql, params, ms):
+    """The ANALYZE plan of ``sql`` on ``alias``, or None if it failed"""
+    # This thread's own connection, closed afterwards.
+    connection = connections[alias]
+    timeout_ms = int(max(ms * 10, 1000))
+    try:
+        with transaction.atomic(using=alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+                cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql, params)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            transaction.set_rollback(True, using=alias)
+        return plan
+    except DatabaseError:
+        logger.exception("EXPLAIN of a slow query failed")
+        return None
+    finally:
+        connection.close()
+
+
+explainer = Explainer()
+
+
+def read_log(path, since=None):
+    """Query entries and the latest plan per fingerprint from a slow query log"""
+    queries, plans = [], {}
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if since is not None and entry.get('at', '') < since:
+                continue
+            if entry.get('type') == 'explain':
+                plans[entry['fingerprint']] = entry
+            elif entry.get('type') == 'query':
+                queries.append(entry)
+    return queries, plans
+
+
+def top_statements(queries, sort='total'):
+    """Queries grouped by fingerprint, with count, total, mean and max ms, slowest first"""
+    groups = {}
+    for entry in queries:
+        group = groups.get(entry['fingerprint'])
+        if group is None:
+            group = groups[entry['fingerprint']] = {
+                'fingerprint': entry['fingerprint'], 'sql': entry['sql'],
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'views': {}, 'fields': {}, 'origins': {},
+            }
+        group['count'] += 1
+        group['total_ms'] += entry['ms']
+        group['max_ms'] = max(group['max_ms'], entry['ms'])
+        for name, value in (('views', entry['view']), ('fields', entry['fields']), ('origins', entry['origin'])):
+            if value:
+                group[name][value] = group[name].get(value, 0) + 1
+    for group in groups.values():
+        group['mean_ms'] = group['total_ms'] / group['count']
+    key = {'total': 'total_ms', 'max': 'max_ms', 'mean': 'mean_ms', 'count': 'count'}[sort]
+    return sorted(groups.values(), key=lambda group: group[key], reverse=True)
@@ -0,0 +1,901 @@
+"""
+Query-count regression tests.
+
+Every route in admin_app/urls.py is called against datasets where each
+table holds N = 1, 10 and 100 rows (orders and table orders with two lines
+each). The number of queries a request runs must not depend on N, so an
+endpoint that starts issuing a query per row fails here with its SQL
+printed.
+
+New routes must be added to ROUTE_CASES (or SKIPPED_ROUTES, with a reason),
+otherwise test_every_route_is_covered fails.
+
+DashboardCounterTests check that the incrementally maintained dashboard
+counters match a full recount after the same row is changed twice.
+
+LoginThrottleTests check the login buckets and who may read their stats.
+
+RoleClaimTests check that only an AdminUser role or a superuser grants the
+admin role.
+
+AsyncReadViewTests check that the async read endpoints apply DRF
+authentication, permission and throttle classes.
+
+EventStreamTests check that the SSE endpoints answer 503 under WSGI.
+
+CartTests cover the payloads the cart endpoint rejects and that a failed
+cart leaves no order behind.
+
+ReplicaRoutingTests add a second SQLite database as the ``replica`` alias
+and check which one reads, writes and exports go to.
+
+MenuSnapshotTests and KitchenListTests check the ETag, filters, keyset pages
+and that writes invalidate the cached lists. RollupTests check that rollups
+match the orders and survive repeated runs and deletes. LogoutTests check
+the token denylist, HotCacheTests the cache and request coalescing, and
+MetricsTests the /metrics token and exposition format.
+"""
+import asyncio
+import datetime
+import json
+import os
+import re
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.throttling import BaseThrottle
+
+from .authentication import issue_tokens
+from .cart import CartError, ingest_cart
+from .counters import compute_counters, rebuild_counters
+from .hot_cache import hot_cache
+from .menu_cache import clear_snapshots
+from .models import (
+    AdminUser, Booking, Category, ContactMessage, DashboardCounters, MenuItem,
+    MenuItemDailyRollup, Order, OrderItem, OrderMenu, RollupDirtyDay, SalesHourlyRollup,
+    Table, WaiterRequest, orderMenuItem
+)
+from .rollups import refresh_rollups
+from .routers import REPLICA, STICKY_COOKIE
+from .single_flight import flights
+from .views import AsyncReadView
+from .urls import urlpatterns
+
+SIZES = (1, 10, 100)
+PASSWORD = 'Sup3r-secret'
+
+# Routes that cannot be called with the test client.
+SKIPPED_ROUTES = {
+    'menuOrder-stream': 'endless ASGI event stream',
+    'waiter-request-stream': 'endless ASGI event stream',
+    'perf-profile-download': 'needs a profile recorded on disk',
+}
+
+
+def seed(n):
+    """Create ``n`` rows per table plus the fixed objects the cases act on"""
+    now = timezone.now()
+    categories = Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(n)])
+    menu_items = MenuItem.objects.bulk_create([
+        MenuItem(name=f'Item {i}', description='', price=Decimal('1000.00'), category=categories[i % n])
+        for i in range(n)
+    ])
+    tables = Table.objects.bulk_create([Table(number=str(i)) for i in range(1, n + 1)])
+
+    orders = Order.objects.bulk_create([
+        Order(customer_name=f'Customer {i}', customer_email='c@example.com', customer_phone='0700000000',
+              total=Decimal('2000.00'), status='pending')
+        for i in range(n)
+    ])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, menu_item=menu_items[j % n], name='Item', price=Decimal('1000.00'), quantity=1)
+        for order in orders for j in range(2)
+    ])
+    menu_orders = OrderMenu.objects.bulk_create([
+        OrderMenu(table=tables[i % n], total_price=2000) for i in range(n)
+    ])
+    orderMenuItem.objects.bulk_create([
+        orderMenuItem(ordermenu=menu_order, item=menu_items[j % n], quantity=1, price=1000)
+        for menu_order in menu_orders for j in range(2)
+    ])
+
+    Booking.objects.bulk_create([
+        Booking(name=f'Guest {i}', email='g@example.com', date=now.date(), time=datetime.time(12), guests=2)
+        for i in range(n)
+    ])
+    ContactMessage.objects.bulk_create([
+        ContactMessage(name=f'Sender {i}', email='s@example.com', message='Hello') for i in range(n)
+    ])
+    WaiterRequest.objects.bulk_create([WaiterRequest(table_number=str(i)) for i in range(n)])
+
+    users = User.objects.bulk_create([User(username=f'staff{i}', password='!') for i in range(n)])
+    AdminUser.objects.bulk_create([
+        AdminUser(user=user, role='manager' if i % 2 else 'waiter') for i, user in enumerate(users)
+    ])
+
+    admin = User.objects.create_user('boss', 'boss@example.com', PASSWORD)
+    admin_user = AdminUser.objects.create(user=admin, role='admin')
+    refresh = issue_tokens(admin, admin_user)
+
+    return {
+        'admin': admin,
+        'admin_user': admin_user,
+        'waiter': AdminUser.objects.filter(role='waiter').first(),
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+        'category': categories[0],
+        'spare_category': Category.objects.create(name='Spare'),
+        'menu_item': menu_items[0],
+        'menu_items': menu_items,
+        'spare_menu_item': MenuItem.objects.create(
+            name='Spare', description='', price=Decimal('500.00'), category=categories[0]
+        ),
+        'table': tables[0],
+        'order': orders[0],
+        'menu_order': menu_orders[0],
+        'booking': Booking.objects.first(),
+        'contact': ContactMessage.objects.first(),
+        'waiter_request': WaiterRequest.objects.first(),
+    }
+
+
+def pk(name):
+    return lambda f: {'pk': f[name].pk}
+
+
+def bearer(f):
+    return {'HTTP_AUTHORIZATION': f"Bearer {f['access']}"}
+
+
+def order_payload(f):
+    return {
+        'customer_name': 'Walk in', 'customer_email': 'w@example.com', 'customer_phone': '0700000000',
+        'total': '2000.00', 'payment_method': 'cash', 'notes': '',
+        'items': [
+            {'menu_item': f['menu_item'].pk, 'name': 'Item', 'price': '1000.00', 'quantity': 1},
+            {'menu_item': f['menu_item'].pk, 'name': 'Item', 'price': '1000.00', 'quantity': 1},
+        ],
+    }
+
+
+def booking_payload(f):
+    return {
+        'name': 'Guest', 'email': 'g@example.com', 'phone': '',
+        'date': (timezone.localdate() + datetime.timedelta(days=1)).isoformat(),
+        'time': '12:00', 'guests': 2, 'notes': '',
+    }
+
+
+def contact_payload(f):
+    return {'name': 'Sender', 'email': 's@example.com', 'phone': '', 'message': 'Hello'}
+
+
+# (url name, method, url kwargs, request body, extra client kwargs)
+# Bodies of multipart endpoints are sent as form data, the rest as JSON.
+ROUTE_CASES = [
+    ('login', 'post', None, lambda f: {'username': 'boss', 'password': PASSWORD}, None),
+    ('logout', 'post', None, lambda f: {'refresh': f['refresh']}, bearer),
+    ('token-refresh', 'post', None, lambda f: {'refresh': f['refresh']}, None),
+    ('login-stats', 'get', None, None, bearer),
+    ('user-profile', 'get', None, None, bearer),
+    ('user-profile', 'put', None, lambda f: {'first_name': 'B', 'last_name': 'Oss', 'email': 'b@example.com'}, bearer),
+    ('change-password', 'post', None, lambda f: {'old_password': PASSWORD, 'new_password': PASSWORD + '2'}, bearer),
+
+    ('dashboard-stats', 'get', None, None, None),
+
+    ('category-list', 'get', None, None, None),
+    ('category-list', 'post', None, lambda f: {'name': 'New', 'description': ''}, None),
+    ('category-detail', 'get', pk('category'), None, None),
+    ('category-detail', 'put', pk('category'), lambda f: {'name': 'Renamed', 'description': ''}, None),
+    ('category-detail', 'delete', pk('spare_category'), None, None),
+
+    ('menu-list', 'get', None, None, None),
+    ('menu-list', 'post', None, lambda f: {
+        'name': 'New', 'description': 'Fresh', 'price': '1500.00', 'category': f['category'].pk,
+    }, None),
+    ('menu-detail', 'get', pk('menu_item'), None, None),
+    ('menu-detail', 'put', pk('menu_item'), lambda f: {
+        'name': 'Renamed', 'description': 'Fresh', 'price': '1500.00', 'category': f['category'].pk,
+    }, None),
+    ('menu-detail', 'delete', pk('spare_menu_item'), None, None),
+
+    ('contact-list', 'get', None, None, None),
+    ('contact-list', 'post', None, contact_payload, None),
+    ('contact-detail', 'get', pk('contact'), None, None),
+    ('contact-detail', 'put', pk('contact'), contact_payload, None),
+    ('contact-detail', 'delete', pk('contact'), None, None),
+    ('contact-status', 'patch', pk('contact'), lambda f: {'status': 'handled'}, None),
+    ('contact-export', 'get', None, None, None),
+
+    ('booking-list', 'get', None, None, None),
+    ('booking-list', 'post', None, booking_payload, None),
+    ('booking-detail', 'get', pk('booking'), None, None),
+    ('booking-detail', 'put', pk('booking'), booking_payload, None),
+    ('booking-detail', 'delete', pk('booking'), None, None),
+    ('booking-status', 'patch', pk('booking'), lambda f: {'status': 'confirmed'}, None),
+    ('booking-export', 'get', None, None, None),
+
+    ('order-list', 'get', None, None, None),
+    ('order-list', 'post', None, order_payload, None),
+    ('order-detail', 'get', pk('order'), None, None),
+    ('order-detail', 'put', pk('order'), order_payload, None),
+    ('order-detail', 'delete', pk('order'), None, None),
+    ('order-status', 'patch', pk('order'), lambda f: {'status': 'delivered'}, None),
+    ('order-export', 'get', None, None, None),
+
+    ('admin-user-list', 'get', None, None, None),
+    ('admin-user-list', 'post', None, lambda f: {
+        'user': {'username': 'newbie', 'email': 'n@example.com', 'first_name': 'N', 'last_name': 'B'},
+        'role': 'waiter', 'phone': '',
+    }, None),
+    ('admin-user-detail', 'get', pk('admin_user'), None, None),
+    ('admin-user-detail', 'put', pk('admin_user'), lambda f: {'role': 'admin', 'phone': '0700000000'}, None),
+    ('admin-user-detail', 'delete', pk('waiter'), None, None),
+
+    # One line per menu item, so the cart grows with N.
+    ('cart', 'post', None, lambda f: {
+        'table_id': f['table'].number, 'total_amount': 1000 * len(f['menu_items']), 'status': 'pending',
+        'items': [
+            {'menu_item_id': item.pk, 'quantity': 1, 'price': '1000.00', 'special_requests': ''}
+            for item in f['menu_items']
+        ],
+    }, None),
+    ('menuOrder', 'get', None, None, None),
+    ('menuOrder-detail', 'patch', pk('menu_order'), lambda f: {'status': 'preparing'}, None),
+    ('menuOrder-detail', 'delete', pk('menu_order'), None, None),
+    ('menuOrder-export', 'get', None, None, None),
+
+    ('waiter-request', 'get', None, None, None),
+    ('waiter-request', 'post', None, lambda f: {'table_number': '1', 'message': 'Bill please'}, None),
+    ('waiter-request-detail', 'patch', pk('waiter_request'), lambda f: {'status': 'acknowledged'}, None),
+    ('waiter-request-detail', 'delete', pk('waiter_request'), None, None),
+
+    ('waiter-list', 'get', None, None, None),
+    ('waiter-list', 'post', None, lambda f: {'waiter_id': f['waiter'].pk, 'status': 'busy'}, None),
+
+    ('reports-sales', 'get', None, None, None),
+
+    ('perf-stats', 'get', None, None, bearer),
+    ('perf-stats', 'delete', None, None, bearer),
+    ('perf-db-pool', 'get', None, None, bearer),
+    ('perf-db-pool', 'delete', None, None, bearer),
+    ('perf-cache', 'get', None, None, bearer),
+    ('perf-cache', 'delete', None, None, bearer),
+    ('perf-profiles', 'get', None, None, bearer),
+    ('perf-profiles', 'delete', None, None, bearer),
+
+    ('metrics', 'get', None, None, lambda f: {'HTTP_AUTHORIZATION': 'Bearer scrape'}),
+]
+
+MULTIPART_ROUTES = {'category-list', 'category-detail', 'menu-list', 'menu-detail'}
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    METRICS_ENABLED=True, METRICS_TOKEN='scrape',
+)
+class QueryCountTests(TestCase):
+    """Queries per request must stay constant as the tables grow"""
+
+    def test_every_route_is_covered(self):
+        covered = {name for name, *_ in ROUTE_CASES} | SKIPPED_ROUTES.keys()
+        missing = sorted(pattern.name for pattern in urlpatterns if pattern.name not in covered)
+        self.assertEqual(missing, [], 'Add these routes to ROUTE_CASES in admin_app/tests.py')
+
+    def test_query_count_is_constant(self):
+        for case in ROUTE_CASES:
+            name, method = case[:2]
+            with self.subTest(route=name, method=method):
+                runs = {n: self.run_case(case, n) for n in SIZES}
+                counts = {n: len(queries) for n, queries in runs.items()}
+                if len(set(counts.values())) > 1:
+                    self.fail(self.describe(name, method, counts, runs))
+
+    def run_case(self, case, n):
+        """Seed ``n`` rows, call the route and return the captured queries"""
+        name, method, kwargs, body, extra = case
+        with transaction.atomic():
+            fixtures = seed(n)
+            # Cached responses, menu snapshots and login buckets would otherwise carry over.
+            for each in caches.all():
+                each.clear()
+            url = reverse(name, kwargs=kwargs(fixtures) if kwargs else None)
+            options = extra(fixtures) if extra else {}
+            if body is not None:
+                if name in MULTIPART_ROUTES:
+                    options['data'] = encode_multipart(BOUNDARY, body(fixtures))
+                    options['content_type'] = MULTIPART_CONTENT
+                else:
+                    options['data'] = json.dumps(body(fixtures))
+                    options['content_type'] = 'application/json'
+
+            # on_commit callbacks (events, cache versions) count as the request's queries.
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                response = self.client.generic(method.upper(), url, **options)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+
+            self.assertLess(
+                response.status_code, 400,
+                f"{method.upper()} {url} with N={n} returned {response.status_code}: "
+                f"{getattr(response, 'content', b'')[:500]}"
+            )
+            transaction.set_rollback(True)
+        return queries.captured_queries
+
+    def describe(self, name, method, counts, runs):
+        largest = runs[SIZES[-1]]
+        smallest = {query['sql'] for query in runs[SIZES[0]]}
+        lines = [
+            f"{method.upper()} {name}: query count grows with N {counts}",
+            f"Queries with N={SIZES[-1]} (* = not run with N={SIZES[0]}):",
+        ]
+        lines += [
+            f"{'*' if query['sql'] not in smallest else ' '} {query['sql']}"
+            for query in largest
+        ]
+        return '\n'.join(lines)
+
+
+class DashboardCounterTests(TestCase):
+    """Counters apply each change once, even from copies loaded before it"""
+
+    def setUp(self):
+        rebuild_counters()
+
+    def assertCountersMatch(self, **expected):
+        counters = DashboardCounters.objects.get()
+        for key, value in {**compute_counters(), **expected}.items():
+            self.assertEqual(getattr(counters, key), value, key)
+
+    def order(self):
+        return Order.objects.create(
+            customer_name='Customer', customer_email='c@example.com', customer_phone='0700000000',
+            total=Decimal('100.00'), status='pending',
+        )
+
+    def test_same_transition_saved_twice(self):
+        order = self.order()
+        first, second = Order.objects.get(pk=order.pk), Order.objects.get(pk=order.pk)
+        first.status = 'delivered'
+        first.save()
+        second.status = 'delivered'
+        second.save()
+        self.assertCountersMatch(pending_orders=0, total_revenue=Decimal('100.00'))
+
+    def test_stale_copy_saved_after_another_change(self):
+        order = self.order()
+        stale = Order.objects.get(pk=order.pk)
+        order.status = 'delivered'
+        order.save()
+        stale.status = 'confirmed'
+        stale.save()
+        self.assertCountersMatch(pending_orders=1, total_revenue=0)
+
+    def test_same_row_deleted_twice(self):
+        order = self.order()
+        first, second = Order.objects.get(pk=order.pk), Order.objects.get(pk=order.pk)
+        first.delete()
+        second.delete()
+        category = Category.objects.create(name='Once')
+        Category.objects.get(pk=category.pk).delete()
+        category.delete()
+        self.assertCountersMatch(pending_orders=0, total_categories=0)
+
+
+class CartTests(TestCase):
+    """Malformed carts get a 400 and never leave a partial order"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Mains')
+        self.menu_item = MenuItem.objects.create(
+            name='Stew', description='', price=Decimal('25000.00'), category=category
+        )
+        Table.objects.create(number='1')
+
+    def cart(self, **line):
+        return {
+            'table_id': '1', 'total_amount': '50000.00',
+            'items': [{'menu_item_id': self.menu_item.pk, 'quantity': 2, 'price': '25000.00', **line}],
+        }
+
+    def post(self, body):
+        return self.client.post(reverse('cart'), json.dumps(body), content_type='application/json')
+
+    def test_prices_as_the_menu_serializes_them(self):
+        self.post(self.cart(price=self.client.get(reverse('menu-list')).json()[0]['price']))
+        response = self.post(self.cart(price='25000.75'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(OrderMenu.objects.values_list('total_price', flat=True)), [50000, 50000])
+        self.assertEqual(
+            list(orderMenuItem.objects.values_list('quantity', 'price')), [(2, 25000), (2, 25000)]
+        )
+
+    def test_malformed_carts(self):
+        bodies = {
+            'not an object': [1],
+            'missing items': {'table_id': '1', 'total_amount': 1},
+            'total not a number': {**self.cart(), 'total_amount': 'abc'},
+            'negative total': {**self.cart(), 'total_amount': '-1'},
+            'null total': {**self.cart(), 'total_amount': None},
+            'infinite total': {**self.cart(), 'total_amount': 'Infinity'},
+            'items not a list': {**self.cart(), 'items': 5},
+            'bad menu item id': self.cart(menu_item_id='x'),
+            'unknown menu item': self.cart(menu_item_id=self.menu_item.pk + 1),
+            'quantity not a number': self.cart(quantity='two'),
+            'decimal quantity string': self.cart(quantity='1.5'),
+            'zero quantity': self.cart(quantity=0),
+            'null quantity': self.cart(quantity=None),
+            'price not a number': self.cart(price='ten'),
+            'negative price': self.cart(price=-5),
+            'NaN price': self.cart(price='NaN'),
+            'missing price': {**self.cart(), 'items': [{'menu_item_id': self.menu_item.pk, 'quantity': 1}]},
+        }
+        for name, body in bodies.items():
+            with self.subTest(name):
+                response = self.post(body)
+                self.assertEqual(response.status_code, 400, response.content)
+                self.assertIn('error', response.json())
+        self.assertEqual(self.post({**self.cart(), 'table_id': '9'}).status_code, 404)
+        self.assertFalse(OrderMenu.objects.exists())
+
+    def test_failed_lines_roll_back_the_order(self):
+        with mock.patch.object(orderMenuItem.objects, 'bulk_create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                ingest_cart(self.cart())
+        self.assertFalse(OrderMenu.objects.exists())
+        with self.assertRaises(CartError):
+            ingest_cart(self.cart(quantity=-1))
+        self.assertFalse(OrderMenu.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginThrottleTests(TestCase):
+    """Login attempts are limited per IP and per username from each IP"""
+
+    def setUp(self):
+        for each in caches.all():
+            each.clear()
+        user = User.objects.create_user('boss', 'boss@example.com', PASSWORD)
+        self.admin_user = AdminUser.objects.create(user=user, role='admin')
+
+    def login(self, password, ip):
+        return self.client.post(
+            reverse('login'), {'username': 'boss', 'password': password},
+            content_type='application/json', REMOTE_ADDR=ip,
+        )
+
+    def test_failures_from_one_ip_do_not_lock_out_another(self):
+        for _ in range(5):
+            self.assertEqual(self.login('wrong', '203.0.113.1').status_code, 401)
+        response = self.login('wrong', '203.0.113.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.login(PASSWORD, '198.51.100.2').status_code, 200)
+
+    def test_ip_bucket_and_forged_forwarded_for(self):
+        for i in range(20):
+            self.client.post(
+                reverse('login'), {'username': f'user{i}', 'password': 'wrong'},
+                content_type='application/json', REMOTE_ADDR='203.0.113.1',
+                HTTP_X_FORWARDED_FOR=f'10.0.0.{i}',
+            )
+        self.assertEqual(self.login(PASSWORD, '203.0.113.1').status_code, 429)
+
+    def test_stats_need_the_admin_role(self):
+        self.assertEqual(self.client.get(reverse('login-stats')).status_code, 401)
+        access = issue_tokens(self.admin_user.user, self.admin_user).access_token
+        response = self.client.get(reverse('login-stats'), HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, 200)
+
+
+class RoleClaimTests(TestCase):
+    """Tokens grant a role only from an AdminUser row or superuser status"""
+
+    def get_perf(self, access):
+        return self.client.get(reverse('perf-stats'), HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_user_without_admin_user_has_no_role(self):
+        user = User.objects.create_user('plain', 'p@example.com', PASSWORD)
+        refresh = issue_tokens(user)
+        self.assertEqual(refresh['role'], '')
+        self.assertEqual(self.get_perf(refresh.access_token).status_code, 403)
+        response = self.client.get(reverse('user-profile'), HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.assertEqual(response.json()['role'], '')
+
+    def test_missing_role_claim_is_denied(self):
+        user = User.objects.create_user('boss', 'boss@example.com', PASSWORD)
+        access = issue_tokens(user, AdminUser.objects.create(user=user, role='admin')).access_token
+        self.assertEqual(self.get_perf(access).status_code, 200)
+        del access['role']
+        self.assertEqual(self.get_perf(access).status_code, 403)
+
+    def test_superuser_and_admin_user_roles(self):
+        superuser = User.objects.create_superuser('root', 'r@example.com', PASSWORD)
+        self.assertEqual(self.get_perf(issue_tokens(superuser).access_token).status_code, 200)
+        waiter = User.objects.create_user('waiter', 'w@example.com', PASSWORD)
+        access = issue_tokens(waiter, AdminUser.objects.create(user=waiter, role='waiter')).access_token
+        self.assertEqual(self.get_perf(access).status_code, 403)
+
+
+class RefuseThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        return False
+
+    def wait(self):
+        return 7
+
+
+class AsyncReadViewTests(TestCase):
+    """Async reads enforce the same DRF policies as APIView"""
+    routes = ('dashboard-stats', 'menuOrder', 'waiter-request', 'category-list', 'menu-list')
+
+    def setUp(self):
+        for each in caches.all():
+            each.clear()
+        user = User.objects.create_user('boss', 'boss@example.com', PASSWORD)
+        self.access = str(issue_tokens(user, AdminUser.objects.create(user=user, role='admin')).access_token)
+
+    def test_permission_classes(self):
+        with mock.patch.object(AsyncReadView, 'permission_classes', [IsAuthenticated]):
+            for name in self.routes:
+                with self.subTest(name):
+                    response = self.client.get(reverse(name))
+                    self.assertEqual(response.status_code, 401)
+                    self.assertIn('Bearer', response['WWW-Authenticate'])
+                    self.assertEqual(
+                        self.client.get(reverse(name), HTTP_AUTHORIZATION='Bearer not-a-token').status_code, 401
+                    )
+                    response = self.client.get(reverse(name), HTTP_AUTHORIZATION=f'Bearer {self.access}')
+                    self.assertEqual(response.status_code, 200)
+
+    def test_throttle_classes(self):
+        with mock.patch.object(AsyncReadView, 'throttle_classes', [RefuseThrottle]):
+            response = self.client.get(reverse('menuOrder'))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '7')
+
+    def test_invalid_cursor(self):
+        for name in ('menuOrder', 'waiter-request'):
+            with self.subTest(name):
+                response = self.client.get(reverse(name), {'cursor': 'zzz'})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+
+
+class EventStreamTests(TestCase):
+    """Event streams refuse WSGI requests instead of holding the worker"""
+
+    def test_wsgi_requests_get_503(self):
+        for name in ('menuOrder-stream', 'waiter-request-stream'):
+            with self.subTest(name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 503)
+                self.assertFalse(response.streaming)
+                self.assertIn('ASGI', response.json()['error'])
+
+
+class ReplicaRoutingTests(TestCase):
+    """Safe requests read the replica unless the client just wrote; exports stay on one database"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Added here rather than in settings, so the test runner does not set
+        # it up for every test. connections.settings is settings.DATABASES,
+        # so replica_configured() sees the alias too.
+        cls.replica_dir = tempfile.mkdtemp()
+        connections.settings[REPLICA] = {
+            **connections.settings['default'],
+            'NAME': os.path.join(cls.replica_dir, 'replica.sqlite3'),
+        }
+        call_command('migrate', database=REPLICA, run_syncdb=True, verbosity=0)
+        cls.databases = {'default', REPLICA}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        shutil.rmtree(cls.replica_dir)
+
+    def setUp(self):
+        for each in caches.all():
+            each.clear()
+
+    def waiter_requests(self, client):
+        return [row['table_number'] for row in client.get(reverse('waiter-request')).json()['results']]
+
+    def test_reads_go_to_the_replica(self):
+        WaiterRequest.objects.using(REPLICA).bulk_create([WaiterRequest(table_number='7')])
+        Booking.objects.using(REPLICA).bulk_create([
+            Booking(name='Replica guest', email='g@example.com', date=timezone.localdate(),
+                    time=datetime.time(12), guests=2)
+        ])
+        self.assertEqual(self.waiter_requests(self.client), ['7'])
+        response = self.client.get(reverse('booking-list'))
+        self.assertContains(response, 'Replica guest')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_writes_make_the_client_sticky_to_the_primary(self):
+        writer = self.client_class()
+        response = writer.post(reverse('waiter-request'), {'table_number': '4'}, content_type='application/json')
+        self.assertLess(response.status_code, 400)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertFalse(WaiterRequest.objects.using(REPLICA).exists())
+
+        self.assertEqual(self.waiter_requests(writer), ['4'])
+        self.assertEqual(self.waiter_requests(self.client), [])
+
+    @override_settings(CORS_ALLOWED_ORIGINS=['https://frontend.example'])
+    def test_cross_site_frontend_stays_sticky(self):
+        # A browser only sends a cookie on cross-site fetches if it is
+        # SameSite=None (and so Secure) and CORS allows credentials.
+        origin = {'HTTP_ORIGIN': 'https://frontend.example'}
+        response = self.client.post(
+            reverse('waiter-request'), {'table_number': '4'}, content_type='application/json', **origin
+        )
+        cookie = response.cookies[STICKY_COOKIE]
+        self.assertEqual(cookie['samesite'], 'None')
+        self.assertTrue(cookie['secure'])
+        self.assertEqual(response['Access-Control-Allow-Credentials'], 'true')
+
+        browser = self.client_class()
+        browser.cookies[STICKY_COOKIE] = cookie.value
+        response = browser.get(reverse('waiter-request'), **origin)
+        self.assertEqual(response['Access-Control-Allow-Origin'], 'https://frontend.example')
+        self.assertEqual([row['table_number'] for row in response.json()['results']], ['4'])
+
+    def test_exports_stay_on_one_database(self):
+        category = Category(pk=1, name='Replica category')
+        menu_item = MenuItem(pk=1, name='Replica item', description='', price=Decimal('10.00'), category=category)
+        order = Order(pk=1, customer_name='Replica customer', customer_email='c@example.com',
+                      customer_phone='0700000000', total=Decimal('10.00'))
+        for model, rows in ((Category, [category]), (MenuItem, [menu_item]), (Order, [order]), (OrderItem, [
+            OrderItem(order=order, menu_item=menu_item, name='Replica item', price=Decimal('10.00'), quantity=1)
+        ])):
+            model.objects.using(REPLICA).bulk_create(rows)
+
+        # The body is streamed after the request has left the routing middleware.
+        response = self.client.get(reverse('order-export'))
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['customer_name'], 'Replica customer')
+        self.assertEqual([item['name'] for item in rows[0]['items']], ['Replica item'])
+
+
+class MenuSnapshotTests(TestCase):
+    """Menu lists answer 304 to a current ETag and change once the menu does"""
+
+    def setUp(self):
+        for each in caches.all():
+            each.clear()
+        clear_snapshots()
+        self.item = MenuItem.objects.create(
+            name='Stew', description='', price=Decimal('100.00'), category=Category.objects.create(name='Mains')
+        )
+
+    def test_etag_and_invalidation(self):
+        response = self.client.get(reverse('menu-list'))
+        etag = response['ETag']
+        self.assertEqual(self.client.get(reverse('menu-list'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.name = 'Pilau'
+            self.item.save()
+        response = self.client.get(reverse('menu-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([item['name'] for item in response.json()], ['Pilau'])
+
+
+class KitchenListTests(TestCase):
+    """Filters, keyset pages and cache invalidation of GET /api/menuOrder"""
+
+    def setUp(self):
+        for each in caches.all():
+            each.clear()
+        self.tables = Table.objects.bulk_create([Table(number='1'), Table(number='2')])
+        self.orders = [
+            OrderMenu.objects.create(table=self.tables[i % 2], total_price=100, status=status)
+            for i, status in enumerate(['pending', 'ready', 'pending', 'delivered', 'preparing'])
+        ]
+        OrderMenu.objects.filter(pk=self.orders[0].pk).update(created_at=timezone.now() - datetime.timedelta(days=2))
+
+    def ids(self, **params):
+        response = self.client.get(reverse('menuOrder'), params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_filters(self):
+        pending = [order.pk for order in self.orders if order.status == 'pending']
+        self.assertEqual(sorted(self.ids(status='pending')), pending)
+        self.assertEqual(sorted(self.ids(status='pending,ready')), [self.orders[i].pk for i in (0, 1, 2)])
+        self.assertEqual(sorted(self.ids(table='2')), [self.orders[1].pk, self.orders[3].pk])
+        since = (timezone.now() - datetime.timedelta(days=1)).isoformat()
+        self.assertEqual(sorted(self.ids(since=since)), [order.pk for order in self.orders[1:]])
+
+        response = self.client.get(reverse('menuOrder'), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+    def test_keyset_pages(self):
+        seen, url = [], reverse('menuOrder') + '?page_size=2'
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page['results']), 2)
+            seen += [row['id'] for row in page['results']]
+            last, url = page, page['next']
+        expected = [order.pk for order in reversed(self.orders[1:])] + [self.orders[0].pk]
+        self.assertEqual(seen, expected)
+        previous = self.client.get(last['previous']).json()
+        self.assertEqual([row['id'] for row in previous['results']], expected[2:4])
+
+    def test_writes_invalidate_the_cached_list(self):
+        self.assertEqual(self.client.get(reverse('menuOrder')).json()['results'][0]['status'], 'preparing')
+        # Bypasses the signals, so the cached list is served.
+        OrderMenu.objects.filter(pk=self.orders[4].pk).update(status='ready')
+        self.assertEqual(self.client.get(reverse('menuOrder')).json()['results'][0]['status'], 'preparing')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('menuOrder-detail', kwargs={'pk': self.orders[4].pk}),
+                {'status': 'delivered'}, content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('menuOrder')).json()['results'][0]['status'], 'delivered')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_cart({'table_id': '1', 'total_amount': 0, 'items': []})
+        self.assertEqual(len(self.ids()), 6)
+
+
+class RollupTests(TestCase):
+    """Rollups match the orders they summarize, however often they run"""
+
+    def setUp(self):
+        self.day = timezone.localdate() - datetime.timedelta(days=3)
+        category = Category.objects.create(name='Mains')
+        self.item = MenuItem.objects.create(name='Stew', description='', price=Decimal('10.00'), category=category)
+        self.orders = []
+        for status, quantity in (('delivered', 1), ('pending', 2), ('cancelled', 4)):
+            order = Order.objects.create(
+                customer_name='Customer', customer_email='c@example.com', customer_phone='0700000000',
+                total=Decimal('10.00') * quantity, status=status, payment_method='cash',
+            )
+            OrderItem.objects.create(order=order, menu_item=self.item, name='Stew', price=Decimal('10.00'),
+                                     quantity=quantity)
+            self.orders.append(order)
+        noon = timezone.make_aware(datetime.datetime.combine(self.day, datetime.time(12)))
+        Order.objects.update(created_at=noon)
+
+    def totals(self):
+        hourly = SalesHourlyRollup.objects.filter(date=self.day)
+        return (
+            sum(row.orders for row in hourly),
+            sum(row.revenue for row in hourly),
+            list(MenuItemDailyRollup.objects.filter(date=self.day).values_list('quantity', 'revenue')),
+        )
+
+    def test_idempotent_sums(self):
+        self.assertEqual(refresh_rollups(), 1)
+        first = (list(SalesHourlyRollup.objects.values_list('date', 'hour', 'status', 'orders', 'revenue')),
+                 self.totals())
+        self.assertEqual(first[1], (3, Decimal('70.00'), [(3, Decimal('30.00'))]))
+        refresh_rollups(full=True)
+        refresh_rollups()
+        self.assertEqual(
+            (list(SalesHourlyRollup.objects.values_list('date', 'hour', 'status', 'orders', 'revenue')),
+             self.totals()),
+            first,
+        )
+
+    def test_deleted_orders_are_recomputed(self):
+        refresh_rollups()
+        Order.objects.get(pk=self.orders[1].pk).delete()
+        self.assertTrue(RollupDirtyDay.objects.filter(date=self.day).exists())
+        self.assertEqual(refresh_rollups(), 1)
+        self.assertEqual(self.totals(), (2, Decimal('50.00'), [(1, Decimal('10.00'))]))
+        self.assertFalse(RollupDirtyDay.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LogoutTests(TestCase):
+    """Logging out denies both tokens until they expire"""
+
+    def test_logout_denies_access_and_refresh_tokens(self):
+        for each in caches.all():
+            each.clear()
+        user = User.objects.create_user('boss', 'boss@example.com', PASSWORD)
+        AdminUser.objects.create(user=user, role='admin')
+        tokens = self.client.post(
+            reverse('login'), {'username': 'boss', 'password': PASSWORD}, content_type='application/json'
+        ).json()
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {tokens['access']}"}
+        self.assertEqual(self.client.get(reverse('user-profile'), **auth).status_code, 200)
+
+        response = self.client.post(
+            reverse('logout'), {'refresh': tokens['refresh']}, content_type='application/json', **auth
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('user-profile'), **auth).status_code, 401)
+        response = self.client.post(
+            reverse('token-refresh'), {'refresh': tokens['refresh']}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class HotCacheTests(SimpleTestCase):
+    """The hot cache computes a key once and single flight runs one of concurrent requests"""
+
+    def setUp(self):
+        for each in caches.all():
+            each.clear()
+
+    def test_get_or_compute_computes_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return b'body'
+        self.assertEqual(hot_cache().get_or_compute('tests:key', compute, 60), b'body')
+        self.assertEqual(hot_cache().get_or_compute('tests:key', compute, 60), b'body')
+        self.assertEqual(len(calls), 1)
+
+    def test_single_flight_coalesces_concurrent_requests(self):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return HttpResponse(b'[1]', content_type='application/json')
+
+        async def run():
+            return await asyncio.gather(*(flights.run('tests|coalesced', compute) for _ in range(5)))
+        responses = asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual({response.content for response in responses}, {b'[1]'})
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_DIR='', METRICS_TOKEN='', DEBUG=False)
+class MetricsTests(TestCase):
+    """/metrics needs a token outside DEBUG and serves the text exposition format"""
+    SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[^}]*\})? (-?[0-9.e+-]+|NaN|\+Inf)$')
+
+    def test_token_required(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with override_settings(METRICS_TOKEN='scrape'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape')
+            self.assertEqual(response.status_code, 200)
+        with override_settings(METRICS_ENABLED=False):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+    @override_settings(METRICS_TOKEN='scrape')
+    def test_exposition_format(self):
+        Table.objects.create(number='1')
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_cart({'table_id': '1', 'total_amount': 0, 'items': []})
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        lines = response.content.decode().splitlines()
+        self.assertIn('# TYPE restaurant_orders_created_total counter', lines)
+        self.assertTrue(any(line.startswith('restaurant_orders_created_total{kind="table"} ') for line in lines))
+        self.assertIn('restaurant_waiter_requests_pending 0', lines)
+        for line in lines:
+            if not line.startswith('#'):
+                self.assertRegex(line, self.SAMPLE)
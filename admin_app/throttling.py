@@ -0,0 +1,134 @@
+"""
+Token-bucket throttle for the login endpoint.
+
+Every login attempt costs a password hash (PBKDF2, hundreds of ms of CPU),
+so attempts are rate limited per username and client IP, and per client
+IP, before ``authenticate()`` runs. The username bucket is kept per IP so
+that failing logins from one address cannot lock the account out for
+everyone else. Each bucket holds ``capacity`` attempts and refills
+one attempt every ``refill_seconds``; an empty bucket answers 429 with a
+Retry-After header.
+
+The client IP is DRF's ``get_ident()``, which trusts X-Forwarded-For only
+as far as ``REST_FRAMEWORK['NUM_PROXIES']`` proxies; with 0 it is
+REMOTE_ADDR, so a forged header cannot get a fresh bucket.
+
+Buckets live in the cache named by ``settings.LOGIN_THROTTLE['CACHE']``. The
+default local-memory cache keeps them per process; a shared cache (Redis,
+memcached, database) shares them between workers. Updates are serialized
+within a process but not across processes, so concurrent workers may let a
+few extra attempts through.
+
+The throttle also counts rejected attempts and times the attempts that were
+hashed, so ``shield_stats()`` can estimate the hashing time saved.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    'CACHE': 'default',
+    'USERNAME_CAPACITY': 5,
+    'USERNAME_REFILL_SECONDS': 30,
+    'IP_CAPACITY': 20,
+    'IP_REFILL_SECONDS': 3,
+}
+KEY_PREFIX = 'login-shield:'
+STATS_KEYS = ('allowed', 'rejected', 'hashes', 'hash_ms')
+
+_lock = threading.Lock()
+
+
+def get_setting(name):
+    return getattr(settings, 'LOGIN_THROTTLE', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[get_setting('CACHE')]
+
+
+class TokenBucket:
+    """A bucket of ``capacity`` tokens refilled at one per ``refill_seconds``"""
+
+    def __init__(self, key, capacity, refill_seconds):
+        self.key = KEY_PREFIX + key
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+
+    def take(self, now=None):
+        """
+        Take one token. Returns 0 on success, otherwise the seconds until
+        a token is available.
+        """
+        now = time.time() if now is None else now
+        cache = get_cache()
+        with _lock:
+            tokens, updated = cache.get(self.key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) / self.refill_seconds)
+            if tokens < 1:
+                return (1 - tokens) * self.refill_seconds
+            cache.set(self.key, (tokens - 1, now), timeout=int(self.capacity * self.refill_seconds) + 1)
+        return 0
+
+
+class LoginRateThrottle(BaseThrottle):
+    """Rejects login attempts once the username or IP bucket is empty"""
+
+    def allow_request(self, request, view):
+        username = str(request.data.get('username') or '').strip().lower()
+        ident = self.get_ident(request)
+        buckets = [
+            TokenBucket(f"ip:{ident}",
+                        get_setting('IP_CAPACITY'), get_setting('IP_REFILL_SECONDS')),
+        ]
+        if username:
+            buckets.append(TokenBucket(f"user:{ident}:{username}",
+                                       get_setting('USERNAME_CAPACITY'),
+                                       get_setting('USERNAME_REFILL_SECONDS')))
+
+        self.retry_after = 0
+        for bucket in buckets:
+            self.retry_after = bucket.take()
+            if self.retry_after:
+                break
+        record('rejected' if self.retry_after else 'allowed')
+        return not self.retry_after
+
+    def wait(self):
+        return self.retry_after
+
+
+def record(name, amount=1):
+    cache = get_cache()
+    key = KEY_PREFIX + 'stats:' + name
+    with _lock:
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+
+
+@contextmanager
+def timed_hash():
+    """Record the time spent hashing a password inside the block"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record('hashes')
+        record('hash_ms', round((time.perf_counter() - start) * 1000))
+
+
+def shield_stats():
+    """Counters since the cache was last cleared, with the hashing time saved"""
+    stats = get_cache().get_many([KEY_PREFIX + 'stats:' + name for name in STATS_KEYS])
+    stats = {name: stats.get(KEY_PREFIX + 'stats:' + name, 0) for name in STATS_KEYS}
+    mean_hash_ms = stats['hash_ms'] / stats['hashes'] if stats['hashes'] else 0
+    return {
+        'allowed': stats['allowed'],
+        'rejected': stats['rejected'],
+        'mean_hash_ms': round(mean_hash_ms, 1),
+        'hash_ms_avoided': round(stats['rejected'] * mean_hash_ms),
+    }
@@ -5,6 +5,8 @@ urlpatterns = [
     # Authentication
     path('auth/login/', views.LoginView.as_view(), name='login'),
     path('auth/logout/', views.LogoutView.as_view(), name='logout'),
+    path('auth/refresh/', views.TokenRefreshView.as_view(), name='token-refresh'),
+    path('auth/login/stats/', views.LoginShieldStatsView.as_view(), name='login-stats'),
     path('auth/profile/', views.UserProfileView.as_view(), name='user-profile'),
     path('auth/change-password/', views.ChangePasswordView.as_view(), name='change-password'),
     
@@ -23,16 +25,19 @@ urlpatterns = [
     path('contacts/', views.ContactMessageListView.as_view(), name='contact-list'),
     path('contacts/<int:pk>/', views.ContactMessageDetailView.as_view(), name='contact-detail'),
     path('contacts/<int:pk>/status/', views.ContactMessageStatusView.as_view(), name='contact-status'),
+    path('contacts/export/', views.ContactMessageExportView.as_view(), name='contact-export'),
     
     # Bookings
     path('bookings/', views.BookingListView.as_view(), name='booking-list'),
     path('bookings/<int:pk>/', views.BookingDetailView.as_view(), name='booking-detail'),
     path('bookings/<int:pk>/status/', views.BookingStatusView.as_view(), name='booking-status'),
+    path('bookings/export/', views.BookingExportView.as_view(), name='booking-export'),
     
     # Orders
     path('orders/', views.OrderListView.as_view(), name='order-list'),
     path('orders/<int:pk>/', views.OrderDetailView.as_view(), name='order-detail'),
     path('orders/<int:pk>/status/', views.OrderStatusView.as_view(), name='order-status'),
+    path('orders/export/', views.OrderExportView.as_view(), name='order-export'),
     
     # Admin Users
     path('admin-users/', views.AdminUserListView.as_view(), name='admin-user-list'),
@@ -44,11 +49,24 @@ urlpatterns = [
     #menuItem
     path('menuOrder', views.MenuOrder.as_view(), name='menuOrder'),
     path('menuOrder/<int:pk>/', views.MenuOrderDetailView.as_view(), name='menuOrder-detail'),
+    path('menuOrder/stream', views.MenuOrderStreamView.as_view(), name='menuOrder-stream'),
+    path('menuOrder/export', views.MenuOrderExportView.as_view(), name='menuOrder-export'),
     
     # Waiter Requests
     path('waiter-request', views.WaiterRequestView.as_view(), name='waiter-request'),
     path('waiter-request/<int:pk>/', views.WaiterRequestDetailView.as_view(), name='waiter-request-detail'),
+    path('waiter-request/stream', views.WaiterRequestStreamView.as_view(), name='waiter-request-stream'),
     
     # Waiters Management
     path('waiters/', views.WaiterListView.as_view(), name='waiter-list'),
+
+    # Reports
+    path('reports/sales', views.SalesReportView.as_view(), name='reports-sales'),
+
+    # Performance
+    path('_perf', views.PerformanceStatsView.as_view(), name='perf-stats'),
+    path('_perf/db', views.DatabasePoolStatsView.as_view(), name='perf-db-pool'),
+    path('_perf/cache', views.HotCacheStatsView.as_view(), name='perf-cache'),
+    path('_perf/profiles', views.ProfileListView.as_view(), name='perf-profiles'),
+    path('_perf/profiles/<str:url_name>/<str:filename>', views.ProfileDownloadView.as_view(), name='perf-profile-download'),
 ]
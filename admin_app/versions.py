@@ -0,0 +1,39 @@
+"""
+Version counters for cached responses.
+
+Workers tag cached responses with a counter kept in a CacheVersion row (one
+row per cache, see the ``*_VERSION`` primary keys) and read it with one
+primary key lookup per request. Writes bump the counter once they commit,
+so every worker moves to new cache keys on its next request. The row lives
+in the database rather than a cache so that all workers see the same value
+even when the cache is per process.
+"""
+import time
+
+from django.db.models import F
+
+from .models import CacheVersion
+
+MENU_VERSION = 1
+KITCHEN_VERSION = 2
+
+
+def new_version_defaults():
+    # Seed from the clock so a recreated row never matches a body the
+    # shared cache still holds for an earlier database.
+    return {'version': time.time_ns()}
+
+
+async def aget_version(pk):
+    """Return the current version of a cache, creating its row on first use"""
+    version = await CacheVersion.objects.filter(pk=pk).values_list('version', flat=True).afirst()
+    if version is None:
+        row, _ = await CacheVersion.objects.aget_or_create(pk=pk, defaults=new_version_defaults())
+        version = row.version
+    return version
+
+
+def bump_version(pk):
+    """Invalidate every worker's entries of a cache"""
+    CacheVersion.objects.get_or_create(pk=pk, defaults=new_version_defaults())
+    CacheVersion.objects.filter(pk=pk).update(version=F('version') + 1)
@@ -1,14 +1,28 @@
+import hashlib
+import logging
+
 from rest_framework.views import APIView
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated
+from rest_framework.settings import api_settings
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
-from django.db.models import Sum, Q
+from django.db.models import Sum, Q, Prefetch
 from django.utils import timezone
-from django.contrib.auth import authenticate, login, logout
+from django.utils.dateparse import parse_date, parse_datetime
+from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.utils.crypto import constant_time_compare
 from datetime import timedelta
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.conf import settings
+from django.db import transaction
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views import View
 from .models import (
     Category, MenuItem, ContactMessage, Booking, 
     Order, OrderItem, AdminUser
@@ -16,31 +30,216 @@ from .models import (
 )
 from .models import *
 from .serializers import *
-
-
-class MenuOrder(APIView):
-    def get(self,request):
-        query = OrderMenu.objects.all()
-        serializer = OrderMenuSerializer(query, many=True)
-        return Response(serializer.data,status=status.HTTP_200_OK)
-
-class CartManagement(APIView):
+from .menu_cache import aget_snapshot, snapshot_response
+from .cart import CartError, ingest_cart
+from .events import encode_event, order_events, waiter_events
+from .pagination import KeysetPaginationMixin
+from .counters import aget_counters
+from .hot_cache import hot_cache
+from .single_flight import SingleFlightMixin, flights
+from .profiling import ProfiledMixin, delete_profiles, list_profiles, profile_path
+from .routers import reads_from_replica
+from .versions import KITCHEN_VERSION, aget_version
+from .fast_serializers import ValuesSerializer, render_json
+from .exports import EXPORTS, FORMATS, export_response
+from .rollups import day_bounds
+from .permissions import IsAdminRole
+from .throttling import LoginRateThrottle, shield_stats, timed_hash
+from .perf import registry as perf_registry
+from .metrics import enabled as metrics_enabled, observe_acknowledged, render as render_metrics
+from .db_pool import checkouts as pool_checkouts, pool_stats
+from .authentication import AdminTokenUser, deny_token, is_denied, issue_tokens, role_display, user_role
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+logger = logging.getLogger(__name__)
+
+
+def kitchen_orders():
+    """OrderMenu rows with what OrderMenuSerializer reads, in a fixed number of queries"""
+    return OrderMenu.objects.select_related('table').prefetch_related(
+        Prefetch('ordering', queryset=orderMenuItem.objects.select_related('item'))
+    )
+
+
+def publish_order_event(name, order):
+    """Push an OrderMenu change to kitchen streams once it is committed"""
+    def publish():
+        # Reloaded so the lines cost one query however many there are.
+        committed = kitchen_orders().filter(pk=order.pk).first()
+        if committed is not None:
+            order_events.publish(name, OrderMenuSerializer(committed).data)
+    transaction.on_commit(publish)
+
+
+def publish_waiter_event(name, waiter_request):
+    """Push a WaiterRequest change to waiter streams once it is committed"""
+    transaction.on_commit(
+        lambda: waiter_events.publish(name, WaiterRequestSerializer(waiter_request).data)
+    )
+
+
+def parse_date_param(request, name):
+    """Parse an optional YYYY-MM-DD query parameter, raising ValueError if invalid"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(name)
+    return parsed
+
+
+def database_user(request):
+    """The User row behind ``request.user``, for views that write to it"""
+    if isinstance(request.user, AdminTokenUser):
+        return get_object_or_404(User, pk=request.user.pk)
+    return request.user
+
+
+def asgi_required(request):
+    """
+    A 503 for event streams requested through WSGI, or None under ASGI.
+    WSGI buffers the async iterator of a StreamingHttpResponse, so the
+    stream would hold a worker forever without sending a byte.
+    """
+    if hasattr(request, 'scope'):
+        return None
+    return json_response(
+        {'error': 'Event streams need the ASGI server (restaurant_admin.asgi:application)'},
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+def event_stream_response(stream):
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class AsyncReadView(View):
+    """
+    Serves GET with the async ORM, so under ASGI a request waiting on the
+    database or on a slow client holds a coroutine instead of a worker
+    thread. Other methods are passed to the DRF ``write_view`` in the
+    thread-sensitive executor, as Django runs any sync view under ASGI.
+
+    GET handlers receive a DRF ``Request``. Authentication, permission and
+    throttle classes run first, as APIView runs them (in the executor, since
+    authenticators and throttles may hit the cache or the database), and
+    ``APIException``s are rendered as DRF would. Under WSGI Django runs the
+    handler in an event loop of its own.
+    """
+    write_view = None
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    get_authenticators = APIView.get_authenticators
+    get_authenticate_header = APIView.get_authenticate_header
+    get_permissions = APIView.get_permissions
+    get_throttles = APIView.get_throttles
+    check_permissions = APIView.check_permissions
+    check_throttles = APIView.check_throttles
+    permission_denied = APIView.permission_denied
+    throttled = APIView.throttled
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') or self.write_view is None:
+            return self.read(Request(request, authenticators=self.get_authenticators()), *args, **kwargs)
+        return self.write(request, *args, **kwargs)
+
+    def check_access(self, request):
+        request.user
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+    async def read(self, request, *args, **kwargs):
+        try:
+            await sync_to_async(self.check_access, thread_sensitive=True)(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.exception_response(request, exc)
+
+    def exception_response(self, request, exc):
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            # As APIView.handle_exception: 403 when no authenticator has a challenge
+            exc.auth_header = self.get_authenticate_header(request)
+            if not exc.auth_header:
+                exc.status_code = status.HTTP_403_FORBIDDEN
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = json_response(data, exc.status_code)
+        if getattr(exc, 'auth_header', None):
+            response['WWW-Authenticate'] = exc.auth_header
+        if getattr(exc, 'wait', None):
+            response['Retry-After'] = '%d' % exc.wait
+        return response
+
+    async def write(self, request, *args, **kwargs):
+        view = sync_to_async(self.write_view.as_view(), thread_sensitive=True)
+        return await view(request, *args, **kwargs)
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(render_json(data), status=status, content_type='application/json')
+
+
+class MenuOrder(ProfiledMixin, SingleFlightMixin, KeysetPaginationMixin, AsyncReadView):
+    """
+    Kitchen order list. Accepts ``status`` (comma separated), ``table`` and
+    ``since`` (ISO datetime) filters so tablets only pull active tickets.
+    """
+    async def get(self, request):
+        query = kitchen_orders()
+
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            query = query.filter(status__in=status_filter.split(','))
+
+        table_filter = request.query_params.get('table')
+        if table_filter:
+            query = query.filter(table__number=table_filter)
+
+        since = request.query_params.get('since')
+        if since:
+            since_value = parse_datetime(since)
+            if since_value is None:
+                return json_response(
+                    {'error': 'Invalid since value, expected an ISO datetime'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if timezone.is_naive(since_value):
+                since_value = timezone.make_aware(since_value)
+            query = query.filter(created_at__gte=since_value)
+
+        async def render():
+            return (await self.apaginated_response(request, query, OrderMenuSerializer)).content
+        # A client that just wrote reads its change from the primary.
+        if not reads_from_replica(request):
+            return HttpResponse(await render(), content_type='application/json')
+        # Tablets poll the same few URLs; links in the body carry the host.
+        # Order writes bump the kitchen version, moving the lists to new keys.
+        version = await aget_version(KITCHEN_VERSION)
+        key = f"kitchen:{version}:" + hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+        content = await hot_cache().aget_or_compute(key, render, settings.HOT_CACHE_TIMEOUTS['kitchen'])
+        return HttpResponse(content, content_type='application/json')
+
+class CartManagement(ProfiledMixin, APIView):
     def post(self,request):
 
         data = request.data
-        print(data)
-        get_table_query = Table.objects.get(number=data["table_id"])
-        if get_table_query:
-           order = OrderMenu.objects.create(total_price = data["total_amount"],
-                                     table=get_table_query,status=data["status"],
-                                     payment_method=data.get("payment_method", "cash"))
-        for  item in data["items"]:
-            get_item = MenuItem.objects.get(id=item["menu_item_id"])
-            price = float(item["price"])
-            orderMenuItem.objects.create(
-            ordermenu = order,item=get_item,quantity=item["quantity"],price=price,special_request=item["special_requests"]
-            )
-        print(get_table_query)
+        logger.debug('Cart payload: %s', data)
+        try:
+            order = ingest_cart(data)
+        except CartError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        publish_order_event('order.created', order)
 
         return Response({"status":True},status=status.HTTP_200_OK)
 
@@ -50,10 +249,11 @@ class MenuOrderDetailView(APIView):
     
     def patch(self, request, pk):
         try:
-            order = OrderMenu.objects.get(pk=pk)
+            order = kitchen_orders().get(pk=pk)
             if 'status' in request.data:
                 order.status = request.data['status']
                 order.save()
+                publish_order_event('order.updated', order)
             serializer = OrderMenuSerializer(order)
             return Response(serializer.data)
         except OrderMenu.DoesNotExist:
@@ -62,28 +262,80 @@ class MenuOrderDetailView(APIView):
     def delete(self, request, pk):
         try:
             order = OrderMenu.objects.get(pk=pk)
+            order_id = order.pk
             order.delete()
+            transaction.on_commit(
+                lambda: order_events.publish('order.deleted', {'id': order_id})
+            )
             return Response({'message': 'Order deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
         except OrderMenu.DoesNotExist:
             return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
-class WaiterRequestView(APIView):
-    """API view for waiter service requests"""
-    
-    def get(self, request):
-        requests = WaiterRequest.objects.all()
-        serializer = WaiterRequestSerializer(requests, many=True)
-        return Response(serializer.data)
-    
+class MenuOrderStreamView(View):
+    """
+    Server-Sent Events stream of kitchen order changes (ASGI only).
+
+    Emits ``order.created``, ``order.updated`` and ``order.deleted`` events.
+    Clients reconnecting with ``Last-Event-ID`` get the events they missed,
+    or a ``reset`` event when they should reload ``GET /api/menuOrder``.
+    """
+
+    async def get(self, request):
+        unavailable = asgi_required(request)
+        if unavailable is not None:
+            return unavailable
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        return event_stream_response(order_events.stream(last_event_id))
+
+
+class WaiterRequestCreateView(APIView):
+    """API view for creating waiter service requests"""
+
     def post(self, request):
         serializer = WaiterRequestSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            waiter_request = serializer.save()
+            publish_waiter_event('request.created', waiter_request)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class WaiterRequestView(SingleFlightMixin, KeysetPaginationMixin, AsyncReadView):
+    """API view for waiter service requests"""
+    write_view = WaiterRequestCreateView
+
+    async def get(self, request):
+        requests = WaiterRequest.objects.all()
+        return await self.apaginated_response(request, requests, WaiterRequestSerializer)
+
+
+class WaiterRequestStreamView(View):
+    """
+    Server-Sent Events stream of waiter calls (ASGI only).
+
+    A client connecting without ``Last-Event-ID`` first receives a
+    ``snapshot`` event holding the pending and acknowledged requests, then
+    ``request.created``, ``request.updated`` and ``request.deleted`` events.
+    """
+    open_statuses = ['pending', 'acknowledged']
+
+    async def get(self, request):
+        unavailable = asgi_required(request)
+        if unavailable is not None:
+            return unavailable
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        initial = None if last_event_id else self.snapshot
+        return event_stream_response(waiter_events.stream(last_event_id, initial=initial))
+
+    async def snapshot(self):
+        open_requests = [
+            waiter_request async for waiter_request in
+            WaiterRequest.objects.filter(status__in=self.open_statuses)
+        ]
+        return [encode_event('snapshot', WaiterRequestSerializer(open_requests, many=True).data)]
+
+
 class WaiterRequestDetailView(APIView):
     """API view for updating and deleting waiter requests"""
     
@@ -97,6 +349,9 @@ class WaiterRequestDetailView(APIView):
                 elif request.data['status'] == 'completed':
                     waiter_request.completed_at = timezone.now()
                 waiter_request.save()
+                if request.data['status'] == 'acknowledged':
+                    observe_acknowledged(waiter_request)
+                publish_waiter_event('request.updated', waiter_request)
             serializer = WaiterRequestSerializer(waiter_request)
             return Response(serializer.data)
         except WaiterRequest.DoesNotExist:
@@ -105,7 +360,11 @@ class WaiterRequestDetailView(APIView):
     def delete(self, request, pk):
         try:
             waiter_request = WaiterRequest.objects.get(pk=pk)
+            request_id = waiter_request.pk
             waiter_request.delete()
+            transaction.on_commit(
+                lambda: waiter_events.publish('request.deleted', {'id': request_id})
+            )
             return Response({'message': 'Request deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
         except WaiterRequest.DoesNotExist:
             return Response({'error': 'Request not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -117,48 +376,38 @@ class WaiterRequestDetailView(APIView):
 class LoginView(APIView):
     """API view for user login"""
     permission_classes = [AllowAny]
+    throttle_classes = [LoginRateThrottle]
 
     def post(self, request):
         username = request.data.get('username')
         password = request.data.get('password')
-        print(username)
+        logger.info('Login attempt for %s', username)
         if not username or not password:
             return Response(
                 {'error': 'Username and password are required'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        user = authenticate(username=username, password=password)
+        with timed_hash():
+            user = authenticate(username=username, password=password)
         
         if user is not None:
-            login(request, user)
-            try:
-                admin_user = AdminUser.objects.get(user=user)
-                return Response({
-                    'message': 'Login successful',
-                    'user': {
-                        'id': user.id,
-                        'username': user.username,
-                        'email': user.email,
-                        'first_name': user.first_name,
-                        'last_name': user.last_name,
-                        'role': admin_user.role,
-                        'role_display': admin_user.get_role_display()
-                    }
-                })
-            except AdminUser.DoesNotExist:
-                return Response({
-                    'message': 'Login successful',
-                    'user': {
-                        'id': user.id,
-                        'username': user.username,
-                        'email': user.email,
-                        'first_name': user.first_name,
-                        'last_name': user.last_name,
-                        'role': 'admin',
-                        'role_display': 'Admin'
-                    }
-                })
+            admin_user = AdminUser.objects.filter(user=user).first()
+            refresh = issue_tokens(user, admin_user)
+            return Response({
+                'message': 'Login successful',
+                'access': str(refresh.access_token),
+                'refresh': str(refresh),
+                'user': {
+                    'id': user.id,
+                    'username': user.username,
+                    'email': user.email,
+                    'first_name': user.first_name,
+                    'last_name': user.last_name,
+                    'role': refresh['role'],
+                    'role_display': role_display(refresh['role'])
+                }
+            })
         else:
             return Response(
                 {'error': 'Invalid credentials'}, 
@@ -171,16 +420,63 @@ class LogoutView(APIView):
     # permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        logout(request)
+        if request.auth is not None:
+            deny_token(request.auth)
+        raw_refresh = request.data.get('refresh')
+        if raw_refresh:
+            try:
+                deny_token(RefreshToken(raw_refresh))
+            except TokenError:
+                pass
         return Response({'message': 'Logout successful'})
 
 
+class LoginShieldStatsView(APIView):
+    """API view for login throttle statistics"""
+    permission_classes = [IsAdminRole]
+
+    def get(self, request):
+        return Response(shield_stats())
+
+
+class TokenRefreshView(APIView):
+    """API view for exchanging a refresh token for a new token pair"""
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        raw_refresh = request.data.get('refresh')
+        if not raw_refresh:
+            return Response(
+                {'error': 'Refresh token is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            old_refresh = RefreshToken(raw_refresh)
+        except TokenError:
+            return Response({'error': 'Invalid refresh token'}, status=status.HTTP_401_UNAUTHORIZED)
+        if is_denied(old_refresh):
+            return Response({'error': 'Invalid refresh token'}, status=status.HTTP_401_UNAUTHORIZED)
+
+        # Claims are rebuilt from the database so role changes take effect.
+        user = User.objects.filter(pk=old_refresh['user_id'], is_active=True).first()
+        if user is None:
+            return Response({'error': 'Invalid refresh token'}, status=status.HTTP_401_UNAUTHORIZED)
+        refresh = issue_tokens(user, AdminUser.objects.filter(user=user).first())
+        deny_token(old_refresh)
+        return Response({
+            'access': str(refresh.access_token),
+            'refresh': str(refresh),
+        })
+
+
 class UserProfileView(APIView):
     """API view for getting and updating current user profile"""
     # permission_classes = [IsAuthenticated]
 
     def get(self, request):
         user = request.user
+        if isinstance(user, AdminTokenUser):
+            return Response(user.profile())
         try:
             admin_user = AdminUser.objects.get(user=user)
             return Response({
@@ -200,13 +496,13 @@ class UserProfileView(APIView):
                 'email': user.email,
                 'first_name': user.first_name,
                 'last_name': user.last_name,
-                'role': 'admin',
-                'role_display': 'Admin',
+                'role': user_role(user),
+                'role_display': role_display(user_role(user)),
                 'phone': ''
             })
 
     def put(self, request):
-        user = request.user
+        user = database_user(request)
         first_name = request.data.get('first_name', '')
         last_name = request.data.get('last_name', '')
         email = request.data.get('email', '')
@@ -235,8 +531,8 @@ class UserProfileView(APIView):
                 'email': user.email,
                 'first_name': user.first_name,
                 'last_name': user.last_name,
-                'role': 'admin',
-                'role_display': 'Admin',
+                'role': user_role(user),
+                'role_display': role_display(user_role(user)),
                 'phone': ''
             })
 
@@ -246,7 +542,7 @@ class ChangePasswordView(APIView):
     # permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        user = request.user
+        user = database_user(request)
         old_password = request.data.get('old_password')
         new_password = request.data.get('new_password')
         
@@ -268,65 +564,47 @@ class ChangePasswordView(APIView):
         return Response({'message': 'Password changed successfully'})
 
 
-class DashboardStatsView(APIView):
+class DashboardStatsView(ProfiledMixin, SingleFlightMixin, AsyncReadView):
     """API view for dashboard statistics"""
     # permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        # Calculate statistics
-        total_categories = Category.objects.count()
-        total_menu_items = MenuItem.objects.count()
-        
-        # Active bookings (new or confirmed)
-        active_bookings = Booking.objects.filter(
-            status__in=['new', 'confirmed']
-        ).count()
-        
-        # Pending orders (pending or confirmed)
-        pending_orders = Order.objects.filter(
-            status__in=['pending', 'confirmed']
-        ).count()
-        
-        # New messages
-        new_messages = ContactMessage.objects.filter(status='new').count()
-        
-        # Total revenue
-        total_revenue = Order.objects.filter(
-            status__in=['delivered', 'ready']
-        ).aggregate(total=Sum('total'))['total'] or 0
+    async def get(self, request):
+        content = await hot_cache().aget_or_compute(
+            'dashboard:stats', self.render, settings.HOT_CACHE_TIMEOUTS['dashboard']
+        )
+        return HttpResponse(content, content_type='application/json')
+
+    async def render(self):
+        # Statistics come from the incrementally maintained counters row
+        counters = await aget_counters()
         
         # Recent bookings (last 5)
-        recent_bookings = Booking.objects.all()[:5]
+        recent_bookings = [booking async for booking in Booking.objects.all()[:5]]
         
         # Recent orders (last 5)
-        recent_orders = Order.objects.all()[:5]
+        recent_orders = [order async for order in Order.objects.prefetch_related('items')[:5]]
         
         data = {
-            'total_categories': total_categories,
-            'total_menu_items': total_menu_items,
-            'active_bookings': active_bookings,
-            'pending_orders': pending_orders,
-            'new_messages': new_messages,
-            'total_revenue': str(total_revenue),  # Convert Decimal to string
+            'total_categories': counters.total_categories,
+            'total_menu_items': counters.total_menu_items,
+            'active_bookings': counters.active_bookings,
+            'pending_orders': counters.pending_orders,
+            'new_messages': counters.new_messages,
+            'total_revenue': str(counters.total_revenue),  # Convert Decimal to string
             'recent_bookings': BookingSerializer(recent_bookings, many=True).data,
             'recent_orders': OrderSerializer(recent_orders, many=True).data,
         }
         
         # Return data directly instead of using serializer to avoid pk issues
-        return Response(data)
+        return render_json(data)
 
 
 # Category Views
-class CategoryListView(APIView):
-    """API view for listing and creating categories"""
+class CategoryCreateView(APIView):
+    """API view for creating categories"""
     # permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]  # <--- important
 
-    def get(self, request):
-        categories = Category.objects.all()
-        serializer = CategorySerializer(categories, many=True)
-        return Response(serializer.data)
-
     def post(self, request):
         serializer = CategorySerializer(data=request.data)
         if serializer.is_valid():
@@ -336,6 +614,16 @@ class CategoryListView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class CategoryListView(AsyncReadView):
+    """API view for listing and creating categories"""
+    write_view = CategoryCreateView
+
+    async def get(self, request):
+        async def build():
+            return CategorySerializer([category async for category in Category.objects.all()], many=True).data
+        return snapshot_response(request, await aget_snapshot('categories', build))
+
+
 class CategoryDetailView(APIView):
     """API view for retrieving, updating and deleting categories"""
     # permission_classes = [IsAuthenticated]
@@ -364,16 +652,11 @@ class CategoryDetailView(APIView):
 
 
 # Menu Item Views
-class MenuItemListView(APIView):
-    """API view for listing and creating menu items"""
+class MenuItemCreateView(APIView):
+    """API view for creating menu items"""
     # permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
-    def get(self, request):
-        menu_items = MenuItem.objects.all()
-        serializer = MenuItemSerializer(menu_items, many=True)
-        return Response(serializer.data)
-
     def post(self, request):
         serializer = MenuItemSerializer(data=request.data)
         if serializer.is_valid():
@@ -382,13 +665,25 @@ class MenuItemListView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class MenuItemListView(AsyncReadView):
+    """API view for listing and creating menu items"""
+    write_view = MenuItemCreateView
+
+    async def get(self, request):
+        async def build():
+            return MenuItemSerializer(
+                [item async for item in MenuItem.objects.select_related('category')], many=True
+            ).data
+        return snapshot_response(request, await aget_snapshot('menu_items', build))
+
+
 class MenuItemDetailView(APIView):
     """API view for retrieving, updating and deleting menu items"""
     # permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def get_object(self, pk):
-        return get_object_or_404(MenuItem, pk=pk)
+        return get_object_or_404(MenuItem.objects.select_related('category'), pk=pk)
 
     def get(self, request, pk):
         menu_item = self.get_object(pk)
@@ -410,14 +705,14 @@ class MenuItemDetailView(APIView):
 
 
 # Contact Message Views
-class ContactMessageListView(APIView):
+class ContactMessageListView(KeysetPaginationMixin, APIView):
     """API view for listing contact messages"""
     # permission_classes = [IsAuthenticated]
+    values_serializer = ValuesSerializer(ContactMessageSerializer)
 
     def get(self, request):
         messages = ContactMessage.objects.all()
-        serializer = ContactMessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(request, messages, ContactMessageSerializer)
     
     def post(self, request):
         """Create a new contact message"""
@@ -511,14 +806,14 @@ class ContactMessageStatusView(APIView):
 
 
 # Booking Views
-class BookingListView(APIView):
+class BookingListView(KeysetPaginationMixin, APIView):
     """API view for listing bookings"""
     # permission_classes = [IsAuthenticated]
+    values_serializer = ValuesSerializer(BookingSerializer)
 
     def get(self, request):
         bookings = Booking.objects.all()
-        serializer = BookingSerializer(bookings, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(request, bookings, BookingSerializer)
     def post(self, request):
         """Create a new booking"""
         try:
@@ -604,14 +899,14 @@ class BookingStatusView(APIView):
 
 
 # Order Views
-class OrderListView(APIView):
+class OrderListView(KeysetPaginationMixin, APIView):
     """API view for listing and creating orders"""
     # permission_classes = [IsAuthenticated]
+    values_serializer = ValuesSerializer(OrderSerializer)
 
     def get(self, request):
         orders = Order.objects.all()
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(request, orders, OrderSerializer)
 
     def post(self, request):
         serializer = OrderCreateSerializer(data=request.data)
@@ -669,14 +964,14 @@ class OrderStatusView(APIView):
 
 
 # Admin User Views
-class AdminUserListView(APIView):
+class AdminUserListView(KeysetPaginationMixin, APIView):
     """API view for listing and creating admin users"""
-    # permission_classes = [IsAuthenticated]
+    # permission_classes = [IsAdminRole]
+    paginate_by_default = False
 
     def get(self, request):
-        admin_users = AdminUser.objects.all()
-        serializer = AdminUserSerializer(admin_users, many=True)
-        return Response(serializer.data)
+        admin_users = AdminUser.objects.select_related('user')
+        return self.paginated_response(request, admin_users, AdminUserSerializer)
 
     def post(self, request):
         serializer = AdminUserCreateSerializer(data=request.data)
@@ -688,10 +983,10 @@ class AdminUserListView(APIView):
 
 class AdminUserDetailView(APIView):
     """API view for retrieving, updating and deleting admin users"""
-    # permission_classes = [IsAuthenticated]
+    # permission_classes = [IsAdminRole]
 
     def get_object(self, pk):
-        return get_object_or_404(AdminUser, pk=pk)
+        return get_object_or_404(AdminUser.objects.select_related('user'), pk=pk)
 
     def get(self, request, pk):
         admin_user = self.get_object(pk)
@@ -762,3 +1057,221 @@ class WaiterListView(APIView):
                 {'error': f'Failed to update waiter status: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class SalesReportView(APIView):
+    """
+    Sales chart data served from the rollup tables.
+
+    Query parameters: ``start`` and ``end`` (dates, default the last 30
+    days), ``granularity`` (``day`` or ``hour``), ``status`` (comma
+    separated, default every status except cancelled) and ``source``
+    (``order`` or ``table``).
+    """
+    # permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            end = parse_date_param(request, 'end') or timezone.localdate()
+            start = parse_date_param(request, 'start') or end - timedelta(days=29)
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date, expected YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in ('day', 'hour'):
+            return Response(
+                {'error': 'granularity must be day or hour'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rollups = SalesHourlyRollup.objects.filter(date__gte=start, date__lte=end)
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            rollups = rollups.filter(status__in=status_filter.split(','))
+        else:
+            rollups = rollups.exclude(status='cancelled')
+        source = request.query_params.get('source')
+        if source:
+            rollups = rollups.filter(source=source)
+
+        keys = ['date', 'hour'] if granularity == 'hour' else ['date']
+        series = (
+            rollups.values(*keys)
+            .annotate(orders=Sum('orders'), revenue=Sum('revenue'))
+            .order_by(*keys)
+        )
+        by_payment_method = (
+            rollups.values('payment_method')
+            .annotate(orders=Sum('orders'), revenue=Sum('revenue'))
+            .order_by('payment_method')
+        )
+        top_items = (
+            MenuItemDailyRollup.objects.filter(date__gte=start, date__lte=end)
+            .values('menu_item_id', 'menu_item__name')
+            .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .order_by('-quantity')[:10]
+        )
+
+        return Response({
+            'start': start,
+            'end': end,
+            'granularity': granularity,
+            'series': [
+                {**{key: row[key] for key in keys}, 'orders': row['orders'], 'revenue': str(row['revenue'])}
+                for row in series
+            ],
+            'by_payment_method': [
+                {'payment_method': row['payment_method'], 'orders': row['orders'], 'revenue': str(row['revenue'])}
+                for row in by_payment_method
+            ],
+            'top_items': [
+                {
+                    'menu_item': row['menu_item_id'],
+                    'name': row['menu_item__name'],
+                    'quantity': row['quantity'],
+                    'revenue': str(row['revenue']),
+                }
+                for row in top_items
+            ],
+        })
+
+
+# Export Views
+class ExportView(APIView):
+    """
+    Base view streaming a model as NDJSON (default) or CSV, picked with
+    ``output=ndjson|csv``. ``start`` and ``end`` (dates) filter on the day
+    the row was created.
+    """
+    # permission_classes = [IsAuthenticated]
+    export = None
+
+    def get_queryset(self):
+        return self.export.model.objects.all()
+
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in FORMATS:
+            return Response(
+                {'error': 'output must be ndjson or csv'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            start = parse_date_param(request, 'start')
+            end = parse_date_param(request, 'end')
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date, expected YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.get_queryset()
+        if start:
+            queryset = queryset.filter(created_at__gte=day_bounds(start)[0])
+        if end:
+            queryset = queryset.filter(created_at__lt=day_bounds(end)[1])
+        return export_response(request, self.export, queryset, output)
+
+
+class OrderExportView(ExportView):
+    """API view for exporting orders with their items"""
+    export = EXPORTS['orders']
+
+
+class MenuOrderExportView(ExportView):
+    """API view for exporting table orders with their items"""
+    export = EXPORTS['menu_orders']
+
+
+class BookingExportView(ExportView):
+    """API view for exporting bookings"""
+    export = EXPORTS['bookings']
+
+
+class ContactMessageExportView(ExportView):
+    """API view for exporting contact messages"""
+    export = EXPORTS['contacts']
+
+
+class PerformanceStatsView(APIView):
+    """API view for the per-route timing histograms of this process"""
+    permission_classes = [IsAdminRole]
+
+    def get(self, request):
+        return Response({
+            'enabled': getattr(settings, 'PERF_ENABLED', False),
+            'routes': perf_registry.snapshot(),
+            'single_flight': flights.stats(),
+        })
+
+    def delete(self, request):
+        perf_registry.reset()
+        flights.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DatabasePoolStatsView(APIView):
+    """API view for the connection checkout and pool metrics of this process"""
+    permission_classes = [IsAdminRole]
+
+    def get(self, request):
+        return Response(pool_stats())
+
+    def delete(self, request):
+        pool_checkouts.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class HotCacheStatsView(APIView):
+    """API view for the hot cache hit and miss counters of this process"""
+    permission_classes = [IsAdminRole]
+
+    def get(self, request):
+        return Response(hot_cache().stats())
+
+    def delete(self, request):
+        hot_cache().reset_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProfileListView(APIView):
+    """API view for the request profiles on disk, by URL name"""
+    permission_classes = [IsAdminRole]
+
+    def get(self, request):
+        return Response({'sample_rate': settings.PROFILE_SAMPLE_RATE, 'profiles': list_profiles()})
+
+    def delete(self, request):
+        delete_profiles()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProfileDownloadView(APIView):
+    """API view for downloading a request profile"""
+    permission_classes = [IsAdminRole]
+
+    def get(self, request, url_name, filename):
+        path = profile_path(url_name, filename)
+        if path is None:
+            return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type='application/json')
+
+
+class MetricsView(APIView):
+    """API view for the Prometheus metrics of all worker processes"""
+    # Scraped with METRICS_TOKEN rather than a user's JWT
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        if not metrics_enabled():
+            return Response({'error': 'Metrics are disabled'}, status=status.HTTP_404_NOT_FOUND)
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        if not token and not settings.DEBUG:
+            return Response({'error': 'METRICS_TOKEN is not set'}, status=status.HTTP_403_FORBIDDEN)
+        if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return Response({'error': 'Invalid metrics token'}, status=status.HTTP_401_UNAUTHORIZED)
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Cart ingestion benchmark
+
+Compares the original one-query-per-line cart handling with the bulk
+``ingest_cart`` path for growing cart sizes, reporting database round trips
+and latency for each.
+
+Usage:
+    python benchmarks/cart_ingest.py [--sizes 1,3,6,12,24,48] [--repeat 30]
+                                     [--database-url postgresql://...]
+"""
+
+import argparse
+from decimal import Decimal
+
+from common import setup_django, summarize, timed
+
+
+def legacy_ingest(data):
+    """The per-line implementation CartManagement.post used to run"""
+    from admin_app.models import MenuItem, OrderMenu, Table, orderMenuItem
+
+    table = Table.objects.get(number=data["table_id"])
+    order = OrderMenu.objects.create(total_price=data["total_amount"],
+                                     table=table, status=data["status"],
+                                     payment_method=data.get("payment_method", "cash"))
+    for item in data["items"]:
+        get_item = MenuItem.objects.get(id=item["menu_item_id"])
+        orderMenuItem.objects.create(
+            ordermenu=order, item=get_item, quantity=item["quantity"],
+            price=float(item["price"]), special_request=item["special_requests"]
+        )
+
+
+def build_cart(menu_items, size):
+    lines = [
+        {
+            "menu_item_id": menu_items[i % len(menu_items)].id,
+            "quantity": 1 + i % 3,
+            "price": str(menu_items[i % len(menu_items)].price),
+            "special_requests": "",
+        }
+        for i in range(size)
+    ]
+    return {
+        "table_id": "1",
+        "total_amount": sum(int(Decimal(line["price"])) * line["quantity"] for line in lines),
+        "status": "pending",
+        "payment_method": "cash",
+        "items": lines,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1,3,6,12,24,48')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    setup_django(args.database_url)
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from admin_app.cart import ingest_cart
+    from admin_app.models import Category, MenuItem, Table
+
+    Table.objects.get_or_create(number="1")
+    category, _ = Category.objects.get_or_create(name="Benchmark")
+    if MenuItem.objects.filter(category=category).count() < 50:
+        MenuItem.objects.bulk_create([
+            MenuItem(name=f"Bench item {i}", description="", price=Decimal(1000 + i), category=category)
+            for i in range(50)
+        ])
+    menu_items = list(MenuItem.objects.filter(category=category))
+
+    print(f"{'lines':>6} {'path':>7} {'queries':>8} {'median ms':>10} {'p95 ms':>8}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        cart = build_cart(menu_items, size)
+        for name, fn in (('legacy', legacy_ingest), ('bulk', ingest_cart)):
+            with CaptureQueriesContext(connection) as queries:
+                fn(cart)
+            stats = summarize(timed(lambda: fn(cart), args.repeat))
+            print(f"{size:>6} {name:>7} {len(queries):>8} {stats['median_ms']:>10} {stats['p95_ms']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Shared setup for the benchmark scripts in this directory.
+
+Benchmarks run against a throwaway SQLite file unless a DATABASE_URL is
+given, and build the schema straight from the models so they never touch
+the development database.
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+
+def setup_django(database_url=None):
+    """Configure Django for a benchmark run and create the schema"""
+    if database_url:
+        os.environ['DATABASE_URL'] = database_url
+    else:
+        db_file = os.path.join(tempfile.mkdtemp(prefix='ypa-bench-'), 'bench.sqlite3')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+    os.environ.setdefault('ALLOWED_HOSTS', 'testserver,localhost,127.0.0.1')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurant_admin.settings')
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.core.management import call_command
+
+    # Build tables from the current models rather than whatever migrations
+    # happen to exist locally.
+    settings.MIGRATION_MODULES = {'admin_app': None}
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+
+def timed(fn, repeat):
+    """Run ``fn`` ``repeat`` times and return the durations in milliseconds"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values``"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(durations):
+    return {
+        'median_ms': round(statistics.median(durations), 3),
+        'p95_ms': round(percentile(durations, 95), 3),
+    }
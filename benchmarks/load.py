@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+"""
+HTTP load benchmark
+
+Drives a weighted mix of the restaurant's real traffic from concurrent
+workers and reports throughput and p50/p95/p99 latency per endpoint:
+
+    menu       GET /api/menu/ and /api/categories/ (half revalidating with
+               If-None-Match, like a browser with a warm cache)
+    cart       POST /api/cart with 1-6 lines
+    kitchen    GET /api/menuOrder?status=pending,confirmed,preparing
+    waiter     POST /api/waiter-request, then GET /api/waiter-request
+    dashboard  GET /api/dashboard/
+
+By default requests go through Django's test client in this process,
+against a throwaway SQLite database (or --database-url) seeded with a
+small menu. With --url they are sent to a running server instead, which
+must already have menu items and the tables named by --tables (e.g. data
+from ``python table.py``).
+
+Usage:
+    python benchmarks/load.py [--duration 30] [--concurrency 4]
+                              [--mix menu=50,cart=10,kitchen=20,waiter=10,dashboard=10]
+                              [--url http://localhost:8000] [--tables 1-12]
+                              [--database-url postgresql://...]
+                              [--output load.json]
+
+Results are written as JSON with the commit they were run on, so runs can
+be compared across commits.
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from common import BASE_DIR, percentile, setup_django
+
+DEFAULT_MIX = 'menu=50,cart=10,kitchen=20,waiter=10,dashboard=10'
+KITCHEN_STATUSES = 'pending,confirmed,preparing'
+
+
+class InProcessClient:
+    """Django test client with the interface of a requests session"""
+
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def get(self, path, headers=None):
+        response = self.client.get(path, headers=headers or {})
+        return response.status_code, response.headers.get('ETag')
+
+    def post(self, path, payload):
+        response = self.client.post(path, payload, content_type='application/json')
+        return response.status_code, None
+
+
+class HTTPClient:
+    """requests session against a running server"""
+
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def get(self, path, headers=None):
+        response = self.session.get(self.base_url + path, headers=headers or {})
+        return response.status_code, response.headers.get('ETag')
+
+    def post(self, path, payload):
+        response = self.session.post(self.base_url + path, json=payload)
+        return response.status_code, None
+
+
+class Recorder:
+    """Latencies and errors per endpoint, shared by the workers"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, label, fn):
+        start = time.perf_counter()
+        try:
+            status, etag = fn()
+        except Exception:
+            status, etag = None, None
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.latencies[label].append(elapsed)
+            if status is None or status >= 400:
+                self.errors[label] += 1
+        return etag
+
+
+class Scenarios:
+    """One method per traffic type; each worker owns an instance"""
+
+    def __init__(self, client, recorder, menu_item_ids, tables, rng):
+        self.client = client
+        self.recorder = recorder
+        self.menu_item_ids = menu_item_ids
+        self.tables = tables
+        self.rng = rng
+        self.etags = {}
+
+    def menu(self):
+        for path in ('/api/menu/', '/api/categories/'):
+            headers = {}
+            if path in self.etags and self.rng.random() < 0.5:
+                headers['If-None-Match'] = self.etags[path]
+            etag = self.recorder.call(f'GET {path}', lambda: self.client.get(path, headers))
+            if etag:
+                self.etags[path] = etag
+
+    def cart(self):
+        lines = [
+            {
+                'menu_item_id': self.rng.choice(self.menu_item_ids),
+                'quantity': self.rng.randint(1, 3),
+                'price': 10000,
+                'special_requests': '',
+            }
+            for _ in range(self.rng.randint(1, 6))
+        ]
+        payload = {
+            'table_id': self.rng.choice(self.tables),
+            'total_amount': sum(line['quantity'] * line['price'] for line in lines),
+            'status': 'pending',
+            'payment_method': self.rng.choice(['cash', 'airtel_money', 'mtn_momo']),
+            'items': lines,
+        }
+        self.recorder.call('POST /api/cart', lambda: self.client.post('/api/cart', payload))
+
+    def kitchen(self):
+        path = f'/api/menuOrder?status={KITCHEN_STATUSES}'
+        self.recorder.call('GET /api/menuOrder', lambda: self.client.get(path))
+
+    def waiter(self):
+        payload = {'table_number': self.rng.choice(self.tables), 'message': 'Waiter needed'}
+        self.recorder.call('POST /api/waiter-request', lambda: self.client.post('/api/waiter-request', payload))
+        self.recorder.call('GET /api/waiter-request', lambda: self.client.get('/api/waiter-request'))
+
+    def dashboard(self):
+        self.recorder.call('GET /api/dashboard/', lambda: self.client.get('/api/dashboard/'))
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, weight = part.split('=')
+        if not hasattr(Scenarios, name):
+            raise SystemExit(f"Unknown scenario: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def parse_tables(value):
+    tables = []
+    for part in value.split(','):
+        if '-' in part:
+            low, high = part.split('-')
+            tables.extend(str(n) for n in range(int(low), int(high) + 1))
+        else:
+            tables.append(part)
+    return tables
+
+
+def seed():
+    """A small menu and twelve tables for in-process runs"""
+    from admin_app.counters import rebuild_counters
+    from admin_app.models import Category, MenuItem, Table
+
+    for number in range(1, 13):
+        Table.objects.get_or_create(number=str(number))
+    for c in range(8):
+        category, _ = Category.objects.get_or_create(name=f'Load category {c}')
+        for i in range(5):
+            MenuItem.objects.get_or_create(
+                name=f'Load item {c}-{i}', category=category,
+                defaults={'description': 'Benchmark item', 'price': Decimal(5000 + 500 * i)},
+            )
+    # Build the dashboard counters row up front rather than in racing workers.
+    rebuild_counters()
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize_endpoint(latencies, errors, duration):
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--url', help='send requests to this server instead of running in-process')
+    parser.add_argument('--tables', default='1-12', help='table numbers for cart and waiter calls')
+    parser.add_argument('--database-url', help='database for in-process runs')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='load.json')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    tables = parse_tables(args.tables)
+
+    if args.url:
+        import requests
+        menu = requests.get(args.url.rstrip('/') + '/api/menu/').json()
+        menu_item_ids = [item['id'] for item in menu]
+        make_client = lambda: HTTPClient(args.url)
+    else:
+        setup_django(args.database_url)
+        seed()
+        from admin_app.models import MenuItem
+        menu_item_ids = list(MenuItem.objects.values_list('id', flat=True))
+        make_client = InProcessClient
+    if not menu_item_ids:
+        raise SystemExit('No menu items to order from')
+
+    recorder = Recorder()
+    names, weights = zip(*mix.items())
+    deadline = time.perf_counter() + args.duration
+
+    def worker(index):
+        rng = random.Random(args.seed + index)
+        scenarios = Scenarios(make_client(), recorder, menu_item_ids, tables, rng)
+        while time.perf_counter() < deadline:
+            getattr(scenarios, rng.choices(names, weights)[0])()
+        if not args.url:
+            from django.db import connection
+            connection.close()
+
+    print(f"Running {args.mix} for {args.duration:g}s with {args.concurrency} workers "
+          f"{'against ' + args.url if args.url else 'in-process'}...")
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {
+        label: summarize_endpoint(latencies, recorder.errors[label], elapsed)
+        for label, latencies in sorted(recorder.latencies.items())
+    }
+    everything = [value for latencies in recorder.latencies.values() for value in latencies]
+    total = summarize_endpoint(everything, sum(recorder.errors.values()), elapsed)
+
+    print(f"\n{'endpoint':<28} {'reqs':>7} {'errors':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, stats in [*endpoints.items(), ('total', total)]:
+        print(f"{label:<28} {stats['requests']:>7} {stats['errors']:>7} {stats['throughput_rps']:>8} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+
+    if args.url:
+        target = args.url
+    else:
+        from django.db import connection
+        target = f'in-process ({connection.vendor})'
+    with open(args.output, 'w') as fh:
+        json.dump({
+            'commit': git_commit(),
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'target': target,
+            'duration_s': round(elapsed, 2),
+            'concurrency': args.concurrency,
+            'mix': mix,
+            'endpoints': endpoints,
+            'total': total,
+        }, fh, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
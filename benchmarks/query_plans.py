@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+"""
+Query plan benchmark for the status/time indexes
+
+Seeds a large dataset, then runs each hot dashboard and list query with the
+indexes from the models' Meta.indexes (and the unique index on
+Table.number) dropped and again with them in place. For every query it
+records the query plan (EXPLAIN ANALYZE on PostgreSQL, EXPLAIN QUERY PLAN on
+SQLite) and the median execution time.
+
+Usage:
+    python benchmarks/query_plans.py [--rows 200000] [--repeat 5]
+                                     [--database-url postgresql://...]
+                                     [--output query_plans.json]
+
+``--rows`` rows are created for each of Order, OrderMenu, WaiterRequest,
+Booking and ContactMessage, about 1M rows in total with the default.
+"""
+
+import argparse
+import json
+import random
+from datetime import timedelta
+
+from common import setup_django, summarize, timed
+
+BATCH_SIZE = 5000
+
+
+def seed(rows, rng):
+    from django.utils import timezone
+    from admin_app.models import (
+        Booking, ContactMessage, Order, OrderMenu, Table, WaiterRequest
+    )
+
+    tables = Table.objects.bulk_create([Table(number=str(n)) for n in range(1, 41)])
+    now = timezone.now()
+
+    def when(i):
+        # Oldest rows first so ids and created_at grow together.
+        return now - timedelta(seconds=(rows - i) * 30)
+
+    def weighted(choices):
+        values, weights = zip(*choices)
+        return rng.choices(values, weights)[0]
+
+    order_statuses = [('delivered', 90), ('cancelled', 5), ('pending', 2),
+                      ('confirmed', 1), ('preparing', 1), ('ready', 1)]
+    payment_methods = ['cash', 'airtel_money', 'mtn_momo']
+
+    builders = [
+        (Order, lambda i: Order(
+            customer_name='Bench', customer_email='bench@example.com', customer_phone='0',
+            total=rng.randint(5, 150) * 1000, status=weighted(order_statuses),
+            payment_method=rng.choice(payment_methods),
+        )),
+        (OrderMenu, lambda i: OrderMenu(
+            table=rng.choice(tables), total_price=rng.randint(5, 150) * 1000,
+            status=weighted(order_statuses), payment_method=rng.choice(payment_methods),
+        )),
+        (WaiterRequest, lambda i: WaiterRequest(
+            table_number=str(rng.randint(1, 40)),
+            status=weighted([('completed', 97), ('acknowledged', 1), ('pending', 2)]),
+        )),
+        (Booking, lambda i: Booking(
+            name='Bench', email='bench@example.com', date=when(i).date(),
+            time=when(i).time(), guests=rng.randint(1, 12),
+            status=weighted([('confirmed', 20), ('cancelled', 75), ('new', 5)]),
+        )),
+        (ContactMessage, lambda i: ContactMessage(
+            name='Bench', email='bench@example.com', message='Hello',
+            status=weighted([('handled', 97), ('new', 3)]),
+        )),
+    ]
+
+    for model, build in builders:
+        print(f"Seeding {rows} {model.__name__} rows...")
+        for start in range(0, rows, BATCH_SIZE):
+            batch = [build(i) for i in range(start, min(start + BATCH_SIZE, rows))]
+            created = model.objects.bulk_create(batch)
+            # created_at is auto_now_add, so spread it out afterwards.
+            for i, obj in zip(range(start, start + len(created)), created):
+                obj.created_at = when(i)
+            model.objects.bulk_update(created, ['created_at'], batch_size=BATCH_SIZE)
+
+
+def hot_queries():
+    """(label, queryset factory) pairs for the dashboard and list screens"""
+    from django.db.models import Q
+    from admin_app.models import (
+        Booking, ContactMessage, Order, OrderMenu, Table, WaiterRequest
+    )
+
+    # A keyset page far from the head of the order list.
+    boundary = Order.objects.order_by('-created_at', '-id').values('created_at', 'id')
+    boundary = boundary[Order.objects.count() // 2]
+
+    def deep_page(model, row):
+        return model.objects.filter(
+            Q(created_at__lt=row['created_at']) | Q(created_at=row['created_at'], id__lt=row['id'])
+        ).order_by('-created_at', '-id')[:21]
+
+    return [
+        ('pending orders count', lambda: Order.objects.filter(status__in=['pending', 'confirmed']), 'count'),
+        ('pending orders list', lambda: Order.objects.filter(status__in=['pending', 'confirmed']).order_by('-created_at')[:20], 'list'),
+        ('active bookings count', lambda: Booking.objects.filter(status__in=['new', 'confirmed']), 'count'),
+        ('new messages count', lambda: ContactMessage.objects.filter(status='new'), 'count'),
+        ('open waiter requests', lambda: WaiterRequest.objects.filter(status__in=['pending', 'acknowledged']).order_by('-created_at'), 'list'),
+        ('kitchen tickets', lambda: OrderMenu.objects.filter(status__in=['pending', 'confirmed', 'preparing']).order_by('-created_at', '-id')[:20], 'list'),
+        ('recent orders', lambda: Order.objects.order_by('-created_at')[:5], 'list'),
+        ('orders deep keyset page', lambda: deep_page(Order, boundary), 'list'),
+        ('table by number', lambda: Table.objects.filter(number='17'), 'list'),
+    ]
+
+
+def set_indexes(enabled):
+    """Drop or recreate the indexes declared for the hot queries"""
+    from django.db import connection
+    from admin_app.models import Booking, ContactMessage, Order, OrderMenu, Table, WaiterRequest
+
+    number = Table._meta.get_field('number')
+    plain_number = number.clone()
+    plain_number._unique = False
+    plain_number.set_attributes_from_name('number')
+    plain_number.model = Table
+
+    with connection.schema_editor() as editor:
+        for model in (Order, OrderMenu, WaiterRequest, Booking, ContactMessage):
+            for index in model._meta.indexes:
+                if enabled:
+                    editor.add_index(model, index)
+                else:
+                    editor.remove_index(model, index)
+        if enabled:
+            editor.alter_field(Table, plain_number, number)
+        else:
+            editor.alter_field(Table, number, plain_number)
+
+
+def measure(repeat):
+    from django.db import connection
+
+    results = {}
+    for label, factory, mode in hot_queries():
+        queryset = factory()
+        if connection.vendor == 'postgresql':
+            plan = queryset.explain(analyze=True, buffers=True)
+        else:
+            plan = queryset.explain()
+        run = (lambda: factory().count()) if mode == 'count' else (lambda: list(factory()))
+        results[label] = {'plan': plan, **summarize(timed(run, repeat))}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url')
+    parser.add_argument('--output', default='query_plans.json')
+    args = parser.parse_args()
+
+    setup_django(args.database_url)
+    from django.db import connection
+
+    seed(args.rows, random.Random(args.seed))
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    set_indexes(False)
+    before = measure(args.repeat)
+    set_indexes(True)
+    after = measure(args.repeat)
+
+    print(f"\n{'query':<28} {'before ms':>10} {'after ms':>10}")
+    for label in before:
+        print(f"{label:<28} {before[label]['median_ms']:>10} {after[label]['median_ms']:>10}")
+        print(f"  before: {before[label]['plan'].splitlines()[0]}")
+        print(f"  after:  {after[label]['plan'].splitlines()[0]}")
+
+    with open(args.output, 'w') as fh:
+        json.dump({
+            'vendor': connection.vendor,
+            'rows': args.rows,
+            'before': before,
+            'after': after,
+        }, fh, indent=2)
+    print(f"\nPlans written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+"""
+List serialization benchmark
+
+Serializes the newest ``--rows`` orders and bookings with the DRF
+ModelSerializers (items prefetched, rendered by JSONRenderer) and with the
+``.values()`` based ValuesSerializer plus ``render_json``, checks that both
+produce the same bytes and reports rows per second for each.
+
+Usage:
+    python benchmarks/serializers.py [--rows 100,1000,5000] [--repeat 10]
+                                     [--database-url postgresql://...]
+"""
+
+import argparse
+import random
+from datetime import date, time
+from decimal import Decimal
+
+from common import setup_django, summarize, timed
+
+
+def seed(count, rng):
+    from admin_app.models import Booking, Category, MenuItem, Order, OrderItem
+
+    category, _ = Category.objects.get_or_create(name="Benchmark")
+    menu_items = MenuItem.objects.bulk_create([
+        MenuItem(name=f"Bench item {i}", description="", price=Decimal(1000 + i), category=category)
+        for i in range(20)
+    ])
+    orders = Order.objects.bulk_create([
+        Order(
+            customer_name=f"Customer {i}", customer_email="bench@example.com",
+            customer_phone="0700000000", total=rng.randint(5, 150) * 1000,
+            status=rng.choice(['pending', 'confirmed', 'delivered', 'cancelled']),
+            payment_method=rng.choice(['cash', 'airtel_money', 'mtn_momo']),
+        )
+        for i in range(count)
+    ])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, menu_item=item, name=item.name, price=item.price, quantity=rng.randint(1, 4))
+        for order in orders
+        for item in rng.sample(menu_items, rng.randint(1, 4))
+    ])
+    Booking.objects.bulk_create([
+        Booking(
+            name=f"Guest {i}", email="bench@example.com", date=date(2025, 1, 1 + i % 28),
+            time=time(12 + i % 10, 30), guests=rng.randint(1, 12),
+            status=rng.choice(['new', 'confirmed', 'cancelled']),
+        )
+        for i in range(count)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='100,1000,5000')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.rows.split(',')]
+    setup_django(args.database_url)
+
+    from rest_framework.renderers import JSONRenderer
+    from admin_app.fast_serializers import ValuesSerializer, orjson, render_json
+    from admin_app.models import Booking, Order
+    from admin_app.serializers import BookingSerializer, OrderSerializer
+
+    seed(max(sizes), random.Random(args.seed))
+    print(f"JSON encoder: {'orjson' if orjson is not None else 'json'}\n")
+
+    cases = [
+        ('OrderSerializer', OrderSerializer, lambda: Order.objects.prefetch_related('items')),
+        ('BookingSerializer', BookingSerializer, lambda: Booking.objects.all()),
+    ]
+
+    print(f"{'serializer':<18} {'rows':>6} {'path':>7} {'median ms':>10} {'p95 ms':>8} {'rows/s':>10}")
+    for label, serializer_class, queryset in cases:
+        fast = ValuesSerializer(serializer_class)
+        for size in sizes:
+            def drf():
+                rows = queryset().order_by('-created_at', '-id')[:size]
+                return JSONRenderer().render(serializer_class(rows, many=True).data)
+
+            def values():
+                rows = fast.values(queryset().order_by('-created_at', '-id')[:size])
+                return render_json(fast.serialize(rows))
+
+            if drf() != values():
+                raise SystemExit(f"{label}: output differs at {size} rows")
+            for name, fn in (('drf', drf), ('values', values)):
+                stats = summarize(timed(fn, args.repeat))
+                rate = round(size / stats['median_ms'] * 1000)
+                print(f"{label:<18} {size:>6} {name:>7} {stats['median_ms']:>10} {stats['p95_ms']:>8} {rate:>10}")
+
+
+if __name__ == '__main__':
+    main()
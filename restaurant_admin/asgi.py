@@ -4,9 +4,15 @@ ASGI config for restaurant_admin project.
 
 import os
 
+from decouple import config
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurant_admin.settings')
+# Persistent connections belong to a thread, and under ASGI the sync code
+# of each request runs in a new executor thread, so they would pile up
+# rather than be reused. Default to a connection per request; use the
+# 'native' pool to reuse connections.
+os.environ.setdefault('DB_POOL', config('DB_POOL', default='off'))
 
 application = get_asgi_application()
 
@@ -6,9 +6,12 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from admin_app.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('admin_app.urls')),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
 
 # Serve media files in development
@@ -7,8 +7,16 @@ Run this script after setting up your PostgreSQL database and running migrations
 
 Usage:
     python table.py
+    python table.py --scale 1000000 [--days 365] [--seed 42] [--end 2025-06-30] [--workers 4]
+
+With --scale the script instead bulk-generates a production-sized history
+for performance testing: SCALE table orders (OrderMenu) with their lines,
+half as many Orders and WaiterRequests and a tenth as many Bookings, spread
+over --days days with lunch/dinner peaks and busier weekends. The same
+seed and --end date always produce the same rows.
 """
 
+import argparse
 import os
 import sys
 import django
@@ -26,6 +34,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurant_admin.settings')
 django.setup()
 
 from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from multiprocessing import Pool
 from admin_app.models import (
     Category, MenuItem, ContactMessage, Booking, Order, OrderItem, 
     AdminUser, WaiterRequest, Table, OrderMenu, orderMenuItem
@@ -582,8 +594,222 @@ def create_sample_waiter_requests(tables):
     
     return created_requests
 
+# Relative traffic by hour of day (lunch and dinner peaks) and by weekday
+# (Monday first, busier towards the weekend).
+HOUR_WEIGHTS = {
+    10: 2, 11: 5, 12: 12, 13: 14, 14: 7, 15: 3, 16: 3,
+    17: 5, 18: 9, 19: 14, 20: 13, 21: 7, 22: 3,
+}
+WEEKDAY_WEIGHTS = [0.8, 0.8, 0.9, 1.0, 1.3, 1.5, 1.2]
+
+PAYMENT_METHODS = ["cash", "airtel_money", "mtn_momo"]
+SCALE_MODELS = [OrderMenu, orderMenuItem, Order, OrderItem, Booking, WaiterRequest]
+
+
+def scale_timestamps(rng, count, days, end):
+    """Draw ``count`` creation times over the ``days`` days before ``end``"""
+    day_offsets = list(range(days))
+    day_weights = [WEEKDAY_WEIGHTS[(end - timedelta(days=d)).weekday()] for d in day_offsets]
+    hours = list(HOUR_WEIGHTS)
+    hour_weights = list(HOUR_WEIGHTS.values())
+
+    picked_days = rng.choices(day_offsets, day_weights, k=count)
+    picked_hours = rng.choices(hours, hour_weights, k=count)
+    timestamps = []
+    for day_offset, hour in zip(picked_days, picked_hours):
+        day = (end - timedelta(days=day_offset)).date()
+        moment = datetime.combine(day, time(hour, rng.randrange(60), rng.randrange(60)))
+        timestamps.append(timezone.make_aware(moment))
+    return sorted(timestamps)
+
+
+def scale_status(rng, created_at, end):
+    """Old orders are settled; only the last few hours have active tickets"""
+    if end - created_at > timedelta(hours=3):
+        return "delivered" if rng.random() < 0.93 else "cancelled"
+    return rng.choice(["pending", "confirmed", "preparing", "ready", "delivered"])
+
+
+def scale_lines(rng, menu_items):
+    return [(rng.choice(menu_items), rng.randint(1, 3)) for _ in range(rng.randint(1, 6))]
+
+
+class auto_timestamps_disabled:
+    """Let bulk_create keep the generated created_at/updated_at values"""
+
+    def __enter__(self):
+        self.fields = [
+            field for model in SCALE_MODELS for field in model._meta.concrete_fields
+            if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+        ]
+        self.saved = [(field.auto_now, field.auto_now_add) for field in self.fields]
+        for field in self.fields:
+            field.auto_now = field.auto_now_add = False
+
+    def __exit__(self, *exc):
+        for field, (auto_now, auto_now_add) in zip(self.fields, self.saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def seed_chunk(task):
+    """Generate one batch of rows; runs in a pool worker"""
+    kind, index, first_id, count, seed, days, end, tables, menu_items = task
+    # Every chunk has its own seed so the output does not depend on how
+    # chunks are spread across worker processes.
+    rng = random.Random(f"{seed}-{kind}-{index}")
+    timestamps = scale_timestamps(rng, count, days, end)
+
+    with auto_timestamps_disabled(), transaction.atomic():
+        if kind == "table_orders":
+            orders, lines = [], []
+            for offset, created_at in enumerate(timestamps):
+                order_id = first_id + offset
+                order_lines = scale_lines(rng, menu_items)
+                for (item_id, price), quantity in order_lines:
+                    lines.append(orderMenuItem(
+                        ordermenu_id=order_id, item_id=item_id, quantity=quantity, price=price,
+                        special_request=rng.choice(["", "", "", "No onions", "Extra spicy"]),
+                    ))
+                orders.append(OrderMenu(
+                    id=order_id, table_id=rng.choice(tables)[0], created_at=created_at,
+                    status=scale_status(rng, created_at, end),
+                    total_price=sum(price * quantity for (_, price), quantity in order_lines),
+                    payment_method=rng.choice(PAYMENT_METHODS),
+                ))
+            OrderMenu.objects.bulk_create(orders)
+            orderMenuItem.objects.bulk_create(lines)
+            return kind, len(orders), len(lines)
+
+        if kind == "orders":
+            orders, lines = [], []
+            for offset, created_at in enumerate(timestamps):
+                order_id = first_id + offset
+                order_lines = scale_lines(rng, menu_items)
+                for (item_id, price), quantity in order_lines:
+                    lines.append(OrderItem(
+                        order_id=order_id, menu_item_id=item_id, name=f"Item {item_id}",
+                        price=price, quantity=quantity,
+                    ))
+                orders.append(Order(
+                    id=order_id, created_at=created_at, updated_at=created_at,
+                    customer_name=f"Customer {order_id}",
+                    customer_email=f"customer{order_id}@example.com",
+                    customer_phone=f"2567{rng.randrange(10 ** 8):08d}",
+                    total=sum(price * quantity for (_, price), quantity in order_lines),
+                    status=scale_status(rng, created_at, end),
+                    payment_method=rng.choice(PAYMENT_METHODS),
+                ))
+            Order.objects.bulk_create(orders)
+            OrderItem.objects.bulk_create(lines)
+            return kind, len(orders), len(lines)
+
+        if kind == "bookings":
+            bookings = []
+            for created_at in timestamps:
+                visit = created_at + timedelta(days=rng.randint(0, 14))
+                bookings.append(Booking(
+                    created_at=created_at, updated_at=created_at,
+                    name=f"Guest {rng.randrange(10 ** 6)}", email="guest@example.com",
+                    date=visit.date(), time=time(rng.choice(list(HOUR_WEIGHTS)[:-1]), rng.choice([0, 30])),
+                    guests=rng.randint(1, 12),
+                    status="new" if visit > end else rng.choice(["confirmed", "confirmed", "cancelled"]),
+                ))
+            Booking.objects.bulk_create(bookings)
+            return kind, len(bookings), 0
+
+        requests = []
+        for created_at in timestamps:
+            settled = end - created_at > timedelta(minutes=30)
+            acknowledged_at = created_at + timedelta(seconds=rng.randint(10, 300))
+            requests.append(WaiterRequest(
+                created_at=created_at, table_number=rng.choice(tables)[1],
+                message=rng.choice(["Waiter needed", "Check please", "Ready to order"]),
+                status="completed" if settled else rng.choice(["pending", "acknowledged"]),
+                acknowledged_at=acknowledged_at if settled else None,
+                completed_at=acknowledged_at + timedelta(minutes=rng.randint(1, 10)) if settled else None,
+            ))
+        WaiterRequest.objects.bulk_create(requests)
+        return kind, len(requests), 0
+
+
+def next_id(model):
+    last = model.objects.order_by("-id").values_list("id", flat=True).first()
+    return (last or 0) + 1
+
+
+def create_scale_data(scale, days, seed, workers, batch_size, end_date=None):
+    """Bulk-generate a large, reproducible order history"""
+    end_date = end_date or timezone.localdate()
+    print(f"Generating scale dataset: {scale} table orders over {days} days "
+          f"ending {end_date} (seed {seed})...")
+    create_tables()
+    create_menu_items(create_categories() or list(Category.objects.all()))
+
+    tables = list(Table.objects.order_by("id").values_list("id", "number"))
+    menu_items = [(pk, int(price)) for pk, price in MenuItem.objects.order_by("id").values_list("id", "price")]
+    end = timezone.make_aware(datetime.combine(end_date, time(23, 0)))
+
+    tasks = []
+    for kind, model, total in (
+        ("table_orders", OrderMenu, scale),
+        ("orders", Order, scale // 2),
+        ("waiter_requests", WaiterRequest, scale // 2),
+        ("bookings", Booking, scale // 10),
+    ):
+        first_id = next_id(model)
+        for index, start in enumerate(range(0, total, batch_size)):
+            count = min(batch_size, total - start)
+            tasks.append((kind, index, first_id + start, count, seed, days, end, tables, menu_items))
+
+    if connection.vendor == "sqlite" and workers > 1:
+        print("  SQLite allows a single writer; using one worker process")
+        workers = 1
+
+    # Workers open their own connections; never share one across a fork.
+    connections.close_all()
+    created = {}
+    with Pool(workers) as pool:
+        for done, (kind, rows, lines) in enumerate(pool.imap_unordered(seed_chunk, tasks), 1):
+            totals = created.setdefault(kind, [0, 0])
+            totals[0] += rows
+            totals[1] += lines
+            if done % 20 == 0 or done == len(tasks):
+                print(f"  {done}/{len(tasks)} batches written")
+
+    # Rows were inserted with explicit ids; move the sequences past them.
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), SCALE_MODELS):
+            cursor.execute(sql)
+
+    print("\n" + "=" * 60)
+    print("SCALE SUMMARY")
+    print("=" * 60)
+    for kind, (rows, lines) in created.items():
+        suffix = f" ({lines} line items)" if lines else ""
+        print(f"✓ {kind.replace('_', ' ').capitalize()}: {rows}{suffix}")
+    print("\nRun 'python manage.py rebuild_dashboard_counters' and "
+          "'python manage.py rollup_sales --full' to refresh derived tables.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create sample data for the restaurant admin")
+    parser.add_argument("--scale", type=int, help="Generate this many table orders (plus related rows) for performance testing")
+    parser.add_argument("--days", type=int, default=365, help="Days of history to spread scale data over")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for scale data")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes for scale data")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Rows per bulk_create batch")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day of scale data (YYYY-MM-DD, default today); "
+                        "pass the same value to reproduce a dataset exactly")
+    return parser.parse_args()
+
+
 def main():
     """Main function to create all table instances"""
+    args = parse_args()
+    if args.scale:
+        create_scale_data(args.scale, args.days, args.seed, args.workers, args.batch_size, args.end)
+        return
+
     print("=" * 60)
     print("RESTAURANT ADMIN - TABLE INSTANCE CREATION")
     print("=" * 60)